@@ -0,0 +1,324 @@
+from .indexing import IndexMapping
+from .utils import load_data_obj, md5
+from collections import OrderedDict
+from collections.abc import Mapping
+from pathlib import Path
+from scipy import sparse
+import hashlib
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import threading
+
+
+DEFAULT_MAX_BYTES = 2 ** 30
+
+
+def file_signatures(path):
+    """Get ``(name, mtime, size)`` for the file at ``path``, or each file in the directory at ``path``."""
+    path = Path(path)
+    files = sorted(path.iterdir()) if path.is_dir() else [path]
+    signatures = []
+    for fp in files:
+        stat = fp.stat()
+        signatures.append((fp.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signatures)
+
+
+def content_hashes(path):
+    """Get ``(name, md5)`` for the file at ``path``, or each file in the directory at ``path``."""
+    path = Path(path)
+    files = sorted(path.iterdir()) if path.is_dir() else [path]
+    return tuple((fp.name, md5(fp)) for fp in files)
+
+
+def data_obj_nbytes(data_obj):
+    """Count the bytes of the arrays held in memory by a loaded data obj.
+
+    Memory-mapped arrays are shared through the OS page cache, and aren't counted. Resources not yet loaded by a :class:`.utils.LazyDatapackage` aren't counted either."""
+    arrays = getattr(data_obj, "loaded", data_obj).values()
+    return sum(
+        array.nbytes for array in arrays
+        if isinstance(array, np.ndarray) and not isinstance(array, np.memmap)
+    )
+
+
+class DatapackageCache(object):
+    """Process-wide cache of loaded datapackages, with least recently used eviction.
+
+    Datapackages are keyed by their resolved path and the modification time and size of their files, so changed datapackages are loaded again. If ``use_hash``, the MD5 hashes of the files are used instead; this is slower, but also detects changes which keep the same modification time and size.
+
+    Entries are evicted, least recently used first, when the arrays held in memory take more than ``max_bytes``. As lazy datapackages load more resources over time, their size is counted when entries are added or retrieved.
+
+    Cached data objects are shared, and must not be modified. This is already the case in ``LCA``, as :func:`.utils.filter_data_for_matrix` copies writeable arrays.
+
+    Args:
+        * *max_bytes* (int, optional): Memory budget for cached arrays. Default is 1 GB.
+        * *use_hash* (bool, optional): Key datapackages by content hash instead of modification time and size.
+
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, use_hash=False):
+        self.max_bytes = max_bytes
+        self.use_hash = use_hash
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+
+    def key(self, data_obj, mmap_mode=None, lazy=False):
+        path = Path(data_obj).resolve()
+        if self.use_hash:
+            signature = content_hashes(path)
+        else:
+            signature = file_signatures(path)
+        return (str(path), signature, mmap_mode, lazy)
+
+    def load(self, data_obj, mmap_mode=None, lazy=False, max_workers=None):
+        """Load ``data_obj`` like :func:`.utils.load_data_obj`, reusing a cached result if possible.
+
+        In-memory data objects are returned as is, and not cached."""
+        if isinstance(data_obj, Mapping) or not Path(data_obj).exists():
+            return load_data_obj(data_obj, mmap_mode=mmap_mode, lazy=lazy, max_workers=max_workers)
+
+        key = self.key(data_obj, mmap_mode=mmap_mode, lazy=lazy)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                result = self.entries[key]
+                self.evict()
+                return result
+
+        result = load_data_obj(data_obj, mmap_mode=mmap_mode, lazy=lazy, max_workers=max_workers)
+        with self.lock:
+            # Drop entries for older versions of this datapackage
+            for stale in [k for k in self.entries if k[0] == key[0] and k[1] != key[1]]:
+                del self.entries[stale]
+            self.entries[key] = result
+            self.evict()
+        return result
+
+    @property
+    def nbytes(self):
+        """Total bytes of arrays held in memory by cached data objects."""
+        with self.lock:
+            return sum(data_obj_nbytes(obj) for obj in self.entries.values())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``.
+
+        The most recently used entry is only removed if it doesn't fit in ``max_bytes`` on its own."""
+        with self.lock:
+            sizes = OrderedDict(
+                (key, data_obj_nbytes(obj)) for key, obj in self.entries.items()
+            )
+            total = sum(sizes.values())
+            for key, size in sizes.items():
+                if total <= self.max_bytes:
+                    break
+                del self.entries[key]
+                total -= size
+
+    def invalidate(self, data_obj):
+        """Remove all entries for the datapackage at path ``data_obj``."""
+        path = str(Path(data_obj).resolve())
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == path]:
+                del self.entries[key]
+
+    def clear(self):
+        """Remove all entries."""
+        with self.lock:
+            self.entries.clear()
+
+
+datapackage_cache = DatapackageCache()
+
+
+def matrix_hash(matrix):
+    """Get a hash of the structure and values of a sparse ``matrix``.
+
+    Matrices with the same values stored differently, e.g. in CSR and CSC format, or with unsorted indices, have different hashes."""
+    hasher = hashlib.blake2b(f"{matrix.format}{matrix.shape}".encode(), digest_size=20)
+    for array in (matrix.indptr, matrix.indices, matrix.data):
+        array = np.ascontiguousarray(array)
+        hasher.update(array.dtype.str.encode())
+        hasher.update(array.view(np.uint8).reshape(-1))
+    return hasher.hexdigest()
+
+
+class FactorizationCache(object):
+    """Process-wide cache of technosphere matrix factorizations, with least recently used eviction.
+
+    Factorizations are keyed by the solver and its options, and by :func:`matrix_hash` of the matrix, so ``LCA`` objects built from the same data share one factorization, and a matrix with changed values is factorized again.
+
+    Entries are evicted, least recently used first, when the estimated size of the factorizations (see :meth:`.solvers.Solver.factorization_nbytes`) is more than ``max_bytes``.
+
+    Args:
+        * *max_bytes* (int, optional): Memory budget for cached factorizations. Default is 1 GB.
+
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+
+    def key(self, solver, matrix, matrix_key=None):
+        """Build a key for factorizing ``matrix`` with ``solver``. ``matrix_key`` is a precomputed :func:`matrix_hash`."""
+        return (solver.__class__.__name__, solver.options(), matrix_key or matrix_hash(matrix))
+
+    def factorize(self, solver, matrix, matrix_key=None):
+        """Factorize ``matrix`` like ``solver.factorize``, reusing a cached result if possible.
+
+        ``matrix`` should already be in ``solver.format``."""
+        key = self.key(solver, matrix, matrix_key)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key][0]
+
+        factorization = solver.factorize(matrix)
+        with self.lock:
+            self.entries[key] = (factorization, solver.factorization_nbytes(factorization, matrix))
+            self.evict()
+        return factorization
+
+    @property
+    def nbytes(self):
+        """Estimated total bytes of cached factorizations."""
+        with self.lock:
+            return sum(nbytes for _, nbytes in self.entries.values())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``.
+
+        The most recently used entry is always kept, as it is usually still in use."""
+        with self.lock:
+            total = self.nbytes
+            for key in list(self.entries)[:-1]:
+                if total <= self.max_bytes:
+                    break
+                total -= self.entries.pop(key)[1]
+
+    def clear(self):
+        """Remove all entries."""
+        with self.lock:
+            self.entries.clear()
+
+
+factorization_cache = FactorizationCache()
+
+
+MATRIX_CACHE_FORMAT = 3
+
+
+def resource_hash(data_obj, resource):
+    """Get a hash of the data in ``resource`` of the loaded ``data_obj``.
+
+    Uses the ``md5`` given in the datapackage if available, otherwise hashes the array data, which loads the resource."""
+    if resource.get("md5"):
+        return resource["md5"]
+    array = np.ascontiguousarray(data_obj[resource["path"]])
+    hasher = hashlib.md5(f"{array.dtype.str}{array.shape}".encode())
+    hasher.update(array.view(np.uint8).reshape(-1))
+    return hasher.hexdigest()
+
+
+class MatrixCache(object):
+    """On-disk cache of built matrices, parameter arrays, and mapping dictionaries.
+
+    Entries are keyed by the hashes of the input resources (see :func:`resource_hash`), and are stored as ``.npy`` files in a subdirectory of ``dirpath``. Cached sparse matrices are stored as their CSR or CSC ``data``, ``indices`` and ``indptr`` arrays, and all arrays are loaded as read-only memory maps.
+
+    Args:
+        * *dirpath* (str or ``Path``): Directory for cache entries. Created if needed.
+
+    """
+    def __init__(self, dirpath):
+        self.dirpath = Path(dirpath)
+        self.dirpath.mkdir(parents=True, exist_ok=True)
+
+    def key(self, data_objs, matrix_labels, parent=None, fields=None):
+        """Build a key from the resources of ``data_objs`` for ``matrix_labels``.
+
+        ``parent`` is the key of entries this one depends on, e.g. the mapping dictionaries used to build a characterization matrix. ``fields`` are the parameter array fields which are kept."""
+        hasher = hashlib.sha256(f"{MATRIX_CACHE_FORMAT}:{parent}:{fields}".encode())
+        for label in matrix_labels:
+            hasher.update(f"|{label}".encode())
+            for data_obj in data_objs:
+                for resource in data_obj["datapackage"]["resources"]:
+                    if resource["matrix"] == label:
+                        hasher.update(resource_hash(data_obj, resource).encode())
+        return hasher.hexdigest()
+
+    def __contains__(self, key):
+        return (self.dirpath / key / "metadata.json").is_file()
+
+    def save(self, key, matrices=None, arrays=None, dicts=None):
+        """Save an entry.
+
+        Args:
+            * *key* (str): Entry key from :meth:`key`.
+            * *matrices* (dict): Sparse matrices by name. CSR and CSC matrices keep their format; others are stored as CSR.
+            * *arrays* (dict): NumPy arrays by name.
+            * *dicts* (dict): Integer mapping dictionaries or ``IndexMapping`` objects by name. Loaded as ``IndexMapping``.
+
+        """
+        matrices, arrays, dicts = matrices or {}, arrays or {}, dicts or {}
+        metadata = {
+            "matrices": {
+                name: {"shape": list(matrix.shape), "format": matrix.format}
+                for name, matrix in matrices.items()
+            },
+            "arrays": list(arrays),
+            "dicts": list(dicts),
+        }
+        tempdir = Path(tempfile.mkdtemp(dir=self.dirpath, prefix=".tmp-"))
+        try:
+            for name, matrix in matrices.items():
+                if matrix.format not in ("csr", "csc"):
+                    matrix = matrix.tocsr()
+                    metadata["matrices"][name]["format"] = "csr"
+                for component in ("data", "indices", "indptr"):
+                    np.save(tempdir / f"{name}.{component}.npy", getattr(matrix, component), allow_pickle=False)
+            for name, array in arrays.items():
+                np.save(tempdir / f"{name}.npy", array, allow_pickle=False)
+            for name, mapping in dicts.items():
+                mapping = IndexMapping.from_dict(mapping)
+                np.save(tempdir / f"{name}.keys.npy", mapping.key_array, allow_pickle=False)
+                np.save(tempdir / f"{name}.values.npy", mapping.value_array, allow_pickle=False)
+            with open(tempdir / "metadata.json", "w") as f:
+                json.dump(metadata, f)
+            # Written completely before becoming visible to other processes
+            os.rename(tempdir, self.dirpath / key)
+        except OSError:
+            if key not in self:
+                raise
+        finally:
+            shutil.rmtree(tempdir, ignore_errors=True)
+
+    def load(self, key):
+        """Load the entry ``key``.
+
+        Returns ``(matrices, arrays, dicts)``, as given to :meth:`save`, or ``None`` if not found."""
+        if key not in self:
+            return None
+        dirpath = self.dirpath / key
+        with open(dirpath / "metadata.json") as f:
+            metadata = json.load(f)
+
+        def load(filename):
+            return np.load(dirpath / filename, mmap_mode="r", allow_pickle=False)
+
+        matrices = {
+            name: getattr(sparse, f"{info['format']}_matrix")((
+                load(f"{name}.data.npy"),
+                load(f"{name}.indices.npy"),
+                load(f"{name}.indptr.npy"),
+            ), shape=tuple(info["shape"]))
+            for name, info in metadata["matrices"].items()
+        }
+        arrays = {name: load(f"{name}.npy") for name in metadata["arrays"]}
+        dicts = {
+            name: IndexMapping(load(f"{name}.keys.npy"), load(f"{name}.values.npy"))
+            for name in metadata["dicts"]
+        }
+        return matrices, arrays, dicts
@@ -1,8 +1,73 @@
 from .lca import LCA
-from numpy.linalg import solve
+from .monte_carlo import MonteCarloLCA
+import numpy as np
+
+
+#: Memory budget for the stacked dense technosphere matrices of a ``DenseMonteCarloLCA`` batch
+DENSE_BATCH_BYTES = 2 ** 27
 
 
 class DenseLCA(LCA):
+    """Solve the linear system with dense LU factorization from LAPACK (see :class:`.solvers.DenseSolver`). Faster than sparse solvers for small technosphere matrices.
+
+    The LU factors are always kept in ``self.solver``, so ``redo_lci`` only needs triangular solves. Use ``lci_many`` to solve many demands in one call."""
+    solver_name = "dense"
+
     def solve_linear_system(self):
-        """Convert technosphere matrix from sparse to dense before solving linear system."""
-        return solve(self.technosphere_matrix.todense(), self.demand_array)
+        if not hasattr(self, "solver"):
+            self.decompose_technosphere()
+        return self.solver(self.demand_array)
+
+
+class DenseMonteCarloLCA(MonteCarloLCA):
+    """Monte Carlo for small technosphere matrices, solving many samples at once.
+
+    Samples are drawn in batches. The dense technosphere matrices of a batch are stacked into one 3-dimensional array, and solved with one batched ``numpy.linalg.solve`` call. Iterating returns the scores of a batch one by one; ``batch`` returns them all at once.
+
+    Args:
+        * *batch_size* (int, optional): Samples per batch. Default fits the stacked matrices in ``DENSE_BATCH_BYTES``.
+
+    """
+    solver_name = "dense"
+
+    def __init__(self, demand, data_objs, *args, batch_size=None, **kwargs):
+        super().__init__(demand, data_objs, *args, **kwargs)
+        self.batch_size = batch_size
+        self.results = iter(())
+
+    def batch(self, size=None):
+        """Draw and solve ``size`` samples (default ``self.batch_size``).
+
+        Returns:
+            A 1-dimensional NumPy array of scores.
+
+        """
+        if not hasattr(self, "tech_rng"):
+            self.load_data()
+        if not hasattr(self, "demand_array"):
+            self.build_demand_array()
+        count = len(self.demand_array)
+        size = size or self.batch_size or max(1, DENSE_BATCH_BYTES // (8 * count * count or 1))
+
+        technosphere = np.empty((size, count, count))
+        characterized = np.empty((size, count))
+        for index in range(size):
+            self.rebuild_technosphere_matrix(self.tech_rng.next())
+            self.rebuild_biosphere_matrix(self.bio_rng.next())
+            self.rebuild_characterization_matrix(self.cf_rng.next())
+            if self.overrides:
+                self.overrides.update_matrices()
+                self.characterization_matrix = self.characterization_matrix
+            technosphere[index] = self.technosphere_matrix.toarray()
+            characterized[index] = self.characterized_biosphere_vector()
+
+        demand = np.broadcast_to(self.demand_array[:, None], (size, count, 1))
+        supply = np.linalg.solve(technosphere, demand)[..., 0]
+        return np.einsum("ij,ij->i", characterized, supply)
+
+    def __next__(self):
+        try:
+            return next(self.results)
+        except StopIteration:
+            self.results = iter(self.batch())
+            return next(self.results)
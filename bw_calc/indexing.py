@@ -1,8 +1,199 @@
 from .utils import MAX_SIGNED_32BIT_INT
-import itertools
+from collections.abc import Mapping
 import numpy as np
 
 
+#: Maximum entries per key in a dense lookup table; see ``IndexMapping.dense_table``
+DENSE_TABLE_RATIO = 4
+DENSE_TABLE_MIN_SIZE = 1024
+
+
+def as_id_array(array):
+    """Convert ``array`` to a 1-dimensional integer array. ``uint64`` arrays are kept as is, so 64-bit hashed IDs don't overflow; everything else is converted to ``int64``."""
+    array = np.asarray(array).ravel()
+    if array.dtype == np.uint64:
+        return array
+    return array.astype(np.int64)
+
+
+class IndexMapping(Mapping):
+    """Compact mapping from integer IDs to matrix indices, stored in NumPy arrays.
+
+    Keys are stored sorted, with their values in the same order, so lookups use ``np.searchsorted`` instead of a Python ``dict``. Supports the ``Mapping`` protocol, so it can be used wherever a ``dict`` like ``{34: 3}`` was used, including comparison with dicts.
+
+    Use :meth:`lookup` and :meth:`reverse_lookup` for vectorized lookups of many values at once, and :meth:`reversed` for the mapping from indices to IDs.
+
+    Args:
+        * *keys* (array): Integer keys. Must be unique. ``uint64`` keys keep their dtype; other keys are stored as ``int64``.
+        * *values* (array, optional): Integer values, in the same order as ``keys``. Default is ``0, 1, 2...``.
+
+    """
+    def __init__(self, keys, values=None):
+        keys = as_id_array(keys)
+        if values is None:
+            values = np.arange(len(keys), dtype=np.int64)
+        else:
+            values = as_id_array(values)
+        if keys.shape != values.shape:
+            raise ValueError("`keys` and `values` must have the same length")
+        if len(keys) and np.any(keys[1:] <= keys[:-1]):
+            order = np.argsort(keys, kind="stable")
+            keys, values = keys[order], values[order]
+            if np.any(keys[1:] == keys[:-1]):
+                raise ValueError("Keys must be unique")
+        self.key_array = keys
+        self.value_array = values
+
+    @classmethod
+    def from_dict(cls, mapping):
+        """Create from a ``dict`` or other ``Mapping``. ``IndexMapping`` objects are returned as is."""
+        if isinstance(mapping, IndexMapping):
+            return mapping
+        try:
+            keys = np.fromiter(mapping.keys(), dtype=np.int64, count=len(mapping))
+        except OverflowError:
+            keys = np.fromiter(mapping.keys(), dtype=np.uint64, count=len(mapping))
+        return cls(keys, np.fromiter(mapping.values(), dtype=np.int64, count=len(mapping)))
+
+    def cast(self, array):
+        """Cast ``array`` to the dtype of ``self.key_array``, so that comparisons with the keys are exact.
+
+        Returns the cast array, and a mask of values which could be cast, or ``None`` if all values could be cast; values outside the range of the key dtype, e.g. negative values for ``uint64`` keys, can't be keys. Raises ``TypeError`` for non-integer arrays, as NumPy would otherwise compare in ``float64`` and merge nearby large keys."""
+        array = np.asarray(array)
+        dtype = self.key_array.dtype
+        if array.dtype == dtype:
+            return array, None
+        if array.size == 0:
+            return array.astype(dtype), None
+        if array.dtype.kind not in "iu":
+            raise TypeError("Can't look up keys with dtype {}; use an integer array".format(array.dtype))
+        valid = None
+        if dtype == np.uint64 and array.dtype.kind == "i":
+            valid = array >= 0
+        elif dtype == np.int64 and array.dtype == np.uint64:
+            valid = array <= np.iinfo(np.int64).max
+        if valid is not None and valid.all():
+            valid = None
+        return array.astype(dtype), valid
+
+    def positions(self, array):
+        """Get the positions of ``array`` values in ``self.key_array``, and a mask of values which are keys."""
+        array, valid = self.cast(array)
+        if not len(self.key_array):
+            return np.zeros(array.shape, dtype=np.intp), np.zeros(array.shape, dtype=bool)
+        positions = np.searchsorted(self.key_array, array)
+        np.clip(positions, 0, len(self.key_array) - 1, out=positions)
+        found = self.key_array[positions] == array
+        if valid is not None:
+            found &= valid
+        return positions, found
+
+    def dense_table(self):
+        """Get ``(offset, table)``, where ``table[key - offset]`` is the value for ``key``, or -1 for missing keys.
+
+        Only built if the keys are dense enough, i.e. the table has at most ``DENSE_TABLE_RATIO`` entries per key; returns ``None`` otherwise. Cached, as keys don't change."""
+        if getattr(self, "_dense_table", None) is None:
+            self._dense_table = False
+            if len(self.key_array) and self.value_array.dtype == np.int64:
+                offset = self.key_array[0]
+                span = int(self.key_array[-1]) - int(offset) + 1
+                if span <= DENSE_TABLE_RATIO * len(self.key_array) + DENSE_TABLE_MIN_SIZE:
+                    table = np.full(span, -1, dtype=np.int64)
+                    table[(self.key_array - offset).astype(np.intp)] = self.value_array
+                    self._dense_table = (offset, table)
+        return self._dense_table or None
+
+    def lookup(self, array, missing=MAX_SIGNED_32BIT_INT):
+        """Map each key in ``array`` to its value. Keys not in the mapping get ``missing``.
+
+        Uses :meth:`dense_table` if possible, and ``np.searchsorted`` on the sorted keys otherwise, so the cost doesn't depend on the magnitude of the keys."""
+        dense = self.dense_table()
+        if dense is None:
+            positions, found = self.positions(array)
+            result = np.full(positions.shape, missing, dtype=self.value_array.dtype)
+            result[found] = self.value_array[positions[found]]
+            return result
+
+        offset, table = dense
+        array, valid = self.cast(array)
+        result = np.full(array.shape, missing, dtype=np.int64)
+        in_range = array >= offset
+        if valid is not None:
+            in_range &= valid
+        in_range[in_range] = (array[in_range] - offset) < len(table)
+        values = table[(array[in_range] - offset).astype(np.intp)]
+        values[values == -1] = missing
+        result[in_range] = values
+        return result
+
+    def reverse_lookup(self, array):
+        """Map each value in ``array`` back to its key. Raises ``KeyError`` for unknown values."""
+        return self.reversed().lookup_strict(array)
+
+    def lookup_strict(self, array):
+        """Map each key in ``array`` to its value. Raises ``KeyError`` for keys not in the mapping."""
+        positions, found = self.positions(array)
+        if not found.all():
+            raise KeyError(np.asarray(array)[~found].ravel()[0])
+        return self.value_array[positions]
+
+    def reversed(self):
+        """Get the ``IndexMapping`` from values to keys. Cached, as values don't change."""
+        if getattr(self, "_reversed", None) is None:
+            if np.array_equal(self.value_array, np.arange(len(self.value_array))):
+                reverse = IndexMapping.__new__(IndexMapping)
+                reverse.key_array, reverse.value_array = self.value_array, self.key_array
+            else:
+                reverse = IndexMapping(self.value_array, self.key_array)
+            reverse._reversed = self
+            self._reversed = reverse
+        return self._reversed
+
+    def __getitem__(self, key):
+        try:
+            integer = int(key)
+        except (TypeError, ValueError, OverflowError):
+            raise KeyError(key)
+        # Like a ``dict``, only keys equal to an integer key match, e.g. not 3.7 for 3
+        if integer != key:
+            raise KeyError(key)
+        key = integer
+        bounds = np.iinfo(self.key_array.dtype)
+        if not bounds.min <= key <= bounds.max:
+            raise KeyError(key)
+        key = self.key_array.dtype.type(key)
+        position = int(np.searchsorted(self.key_array, key))
+        if position < len(self.key_array) and self.key_array[position] == key:
+            return int(self.value_array[position])
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return (int(x) for x in self.key_array)
+
+    def __len__(self):
+        return len(self.key_array)
+
+    def items(self):
+        return zip(self, (int(x) for x in self.value_array))
+
+    def __repr__(self):
+        return "IndexMapping({} keys)".format(len(self))
+
+    def __getstate__(self):
+        return {"key_array": self.key_array, "value_array": self.value_array}
+
+    def __setstate__(self, state):
+        self.key_array = state["key_array"]
+        self.value_array = state["value_array"]
+
+
 def index_with_arrays(array_from, array_to, mapping):
     """Map ``array_from`` keys to ``array_to`` values using the dictionary ``mapping``.
 
@@ -24,22 +215,15 @@ def index_with_arrays(array_from, array_to, mapping):
     Args:
         * *array_from* (array): 1-dimensional integer numpy array.
         * *array_to* (array): 1-dimensional integer numpy array.
-        * *mapping* (dict): Dictionary that links ``mapping`` indices to ``row`` or ``col`` indices, e.g. ``{34: 3}``.
+        * *mapping* (dict or ``IndexMapping``): Dictionary that links ``mapping`` indices to ``row`` or ``col`` indices, e.g. ``{34: 3}``.
 
-    Operates in place. Doesn't return anything."""
-    keys = np.array(list(mapping.keys()))
-    values = np.array(list(mapping.values()))
+    Operates in place. Doesn't return anything.
 
-    if keys.min() < 0:
+    ``mapping`` is converted to an :class:`IndexMapping` if needed. Pass an ``IndexMapping`` when calling this function repeatedly, as its prepared lookup structure is reused; see :meth:`IndexMapping.lookup`. Keys can be arbitrarily large 64-bit integers, including ``uint64`` hashed IDs."""
+    mapping = IndexMapping.from_dict(mapping)
+    if len(mapping) and mapping.key_array[0] < 0:
         raise ValueError("Keys must be positive integers")
-
-    index_array = np.zeros(keys.max() + 1) - 1
-    index_array[keys] = values
-
-    mask = array_from <= keys.max()
-    array_to[:] = -1
-    array_to[mask] = index_array[array_from[mask]]
-    array_to[array_to == -1] = MAX_SIGNED_32BIT_INT
+    array_to[:] = mapping.lookup(array_from)
 
 
 def index_with_searchsorted(array_from, array_to):
@@ -55,16 +239,12 @@ def index_with_searchsorted(array_from, array_to):
         array = np.array((4, 8, 6, 2, 4))
         output = np.zeros(5)
         index_with_searchsorted(array, output)
-        # => returns {2: 0, 4: 1, 6: 2, 8: 3}
+        # => returns IndexMapping equal to {2: 0, 4: 1, 6: 2, 8: 3}
         # and `output` is [1, 3, 2, 0, 1]
 
     ``array_from`` and ``array_to`` are arrays of integers.
 
-    Returns a dictionary that maps the sorted, unique elements of ``array_from`` to integers starting with zero."""
-    unique = np.unique(array_from)
-    idx = np.searchsorted(unique, array_from)
+    Returns an :class:`IndexMapping` that maps the sorted, unique elements of ``array_from`` to integers starting with zero."""
+    unique, idx = np.unique(array_from, return_inverse=True)
     array_to[:] = idx
-    return dict(zip(
-        (int(x) for x in unique),
-        itertools.count()
-    ))
+    return IndexMapping(unique)
@@ -3,20 +3,20 @@ from .errors import (
     NonsquareTechnosphere,
     OutsideTechnosphere,
 )
+from .caching import MatrixCache, datapackage_cache, factorization_cache, matrix_hash
+from .indexing import IndexMapping
 # import pandas
 from .log_utils import create_logger
 from .matrices import MatrixBuilder
+from .solvers import SchurComplementSolver, get_solver, select_solver
 from .utils import filter_data_for_matrix, load_data_obj
 from collections.abc import Mapping
+from itertools import chain
 from scipy import sparse
 import logging
 import numpy as np
 import warnings
 
-try:
-    from pypardiso import factorized, spsolve
-except ImportError:
-    from scipy.sparse.linalg import factorized, spsolve
 try:
     from overrides import PackagesDataLoader
 except ImportError:
@@ -29,16 +29,33 @@ class LCA(object):
     Following the general philosophy of Brightway, and good software practices, there is a clear separation of concerns between retrieving and formatting data and doing an LCA. Building the necessary matrices is done with MatrixBuilder objects (:ref:`matrixbuilders`). The LCA class only does the LCA calculations themselves.
 
     """
+    #: Fields kept in the parameter arrays (``tech_params``, etc.). ``None`` keeps all fields.
+    param_fields = MatrixBuilder.fields
+    #: Default solver, if none is given. ``None`` uses :func:`.solvers.default_solver_name`.
+    solver_name = None
+    #: Raise ``NonsquareTechnosphere`` if the technosphere matrix isn't square
+    square_technosphere = True
+    #: Largest number of changed technosphere columns solved with low-rank updates in ``lci_with_edits``; more are solved by refactorizing
+    max_update_rank = 50
+
     #############
     ### Setup ###
     #############
 
-    def __init__(self, demand, data_objs, log_config=None, overrides=None, seed=None, ignore_override_seed=None):
+    def __init__(self, demand, data_objs, log_config=None, overrides=None, seed=None, ignore_override_seed=None, mmap_mode=None, lazy=False, use_cache=False, max_workers=None, matrix_cache=None, solver=None, cache_factorization=False, foreground=None):
         """Create a new LCA calculation.
 
         Args:
             * *demand* (dict): The demand or functional unit. Needs to be a dictionary to indicate amounts, e.g. ``{(77: 2.5}``.
             * *data_obj*
+            * *mmap_mode* (str, optional): Open directory datapackage resources as memory maps, e.g. ``"r"``. See :func:`.utils.load_data_obj`.
+            * *lazy* (bool, optional): Only load datapackage resources for the matrices which are actually built. See :class:`.utils.LazyDatapackage`.
+            * *use_cache* (bool, optional): Reuse datapackages already loaded in this process. See :class:`.caching.DatapackageCache`.
+            * *max_workers* (int, optional): Load datapackage resources concurrently with this many threads.
+            * *matrix_cache* (``MatrixCache`` or directory path, optional): Persistent cache of built matrices. See :class:`.caching.MatrixCache`.
+            * *solver* (str or ``Solver``, optional): Linear solver backend, either a registered solver name (see :mod:`.solvers`), a ``Solver`` instance, or ``"auto"`` to choose one from the size and density of the technosphere matrix (see :func:`.solvers.select_solver`).
+            * *cache_factorization* (bool, optional): Always factorize the technosphere matrix, and share factorizations of identical matrices in this process. See :class:`.caching.FactorizationCache`.
+            * *foreground* (tuple, optional): ``(product IDs, activity IDs)`` of a small foreground system. The rest of the technosphere is a fixed background, which is factorized once, and foreground changes are solved through a Schur complement. ``solver`` is then used for the background. See :class:`.solvers.SchurComplementSolver`.
 
         Returns:
             A new LCA object
@@ -52,7 +69,20 @@ class LCA(object):
         self.logger = logging.getLogger('bw_calc')
 
         self.demand = demand
-        self.data_objs = [load_data_obj(o) for o in data_objs]
+        self.max_workers = max_workers
+        solver = solver or self.solver_name
+        # Chosen in ``load_lci_data`` once the technosphere matrix is known
+        self.solver_backend = None if solver == "auto" else get_solver(solver)
+        self.cache_factorization = cache_factorization
+        self.foreground = foreground
+        if matrix_cache is not None and not isinstance(matrix_cache, MatrixCache):
+            matrix_cache = MatrixCache(matrix_cache)
+        self.matrix_cache = matrix_cache
+        load = datapackage_cache.load if use_cache else load_data_obj
+        self.data_objs = [
+            load(o, mmap_mode=mmap_mode, lazy=lazy, max_workers=max_workers)
+            for o in data_objs
+        ]
 
         if overrides and PackagesDataLoader is None:
             warnings.warn("Skipping overrides; `overrides` not installed")
@@ -79,6 +109,11 @@ class LCA(object):
             # 'weighting_filepath': self.weighting_filepath,
         })
 
+    @property
+    def technosphere_format(self):
+        """Sparse format of the technosphere matrix; the format the solver uses, so it isn't converted before solving."""
+        return self.solver_backend.format if self.solver_backend is not None else "csc"
+
     def build_demand_array(self, demand=None):
         """Turn the demand dictionary into a *NumPy* array of correct size.
 
@@ -103,37 +138,115 @@ class LCA(object):
                 else:
                     raise OutsideTechnosphere("Can't find key {} in product dictionary".format(key))
 
+    def build_demand_matrix(self, demands):
+        """Turn a list of demand dictionaries into a sparse demand matrix, with one column per demand.
+
+        Args:
+            * *demands* (list): Demand dictionaries, e.g. ``[{3: 1}, {4: 2.5, 3: 1}]``.
+
+        Returns:
+            A sparse CSC matrix with shape (# of products, # of demands)
+
+        """
+        demands = list(demands)
+        counts = np.fromiter((len(demand) for demand in demands), dtype=np.int64, count=len(demands))
+        total = int(counts.sum())
+        keys = np.fromiter(chain.from_iterable(demands), dtype=np.int64, count=total)
+        amounts = np.fromiter(
+            chain.from_iterable(demand.values() for demand in demands),
+            dtype=np.float64, count=total
+        )
+        rows = IndexMapping.from_dict(self.product_dict).lookup(keys, missing=-1)
+        if (rows == -1).any():
+            key = int(keys[rows == -1][0])
+            if key in self.activity_dict:
+                raise ValueError((u"LCA can only be performed on products,"
+                    u" not activities ({} is the wrong dimension)"
+                    ).format(key)
+                )
+            raise OutsideTechnosphere("Can't find key {} in product dictionary".format(key))
+        cols = np.repeat(np.arange(len(demands)), counts)
+        return sparse.csc_matrix(
+            (amounts, (rows, cols)), shape=(len(self.product_dict), len(demands))
+        )
+
     #########################
     ### Data manipulation ###
     #########################
 
     def reverse_dict(self):
-        """Construct reverse dicts from technosphere and biosphere row and col indices to input values.
+        """Construct reverse mappings from technosphere and biosphere row and col indices to input values.
+
+        The reversed :class:`.indexing.IndexMapping` objects share their arrays with the forward mappings, and are cached.
 
         Returns:
             (reversed ``self.activity_dict``, ``self.product_dict`` and ``self.biosphere_dict``)
         """
-        rev_activity = {v: k for k, v in self.activity_dict.items()}
-        rev_product = {v: k for k, v in self.product_dict.items()}
-        rev_bio = {v: k for k, v in self.biosphere_dict.items()}
-        return rev_activity, rev_product, rev_bio
+        return (
+            IndexMapping.from_dict(self.activity_dict).reversed(),
+            IndexMapping.from_dict(self.product_dict).reversed(),
+            IndexMapping.from_dict(self.biosphere_dict).reversed(),
+        )
 
     ######################
     ### Data retrieval ###
     ######################
 
     def load_lci_data(self):
-        """Load data and create technosphere and biosphere matrices."""
-        self.tech_params = filter_data_for_matrix(self.data_objs, "technosphere")
-        self.product_dict, self.activity_dict, self.technosphere_matrix = MatrixBuilder.build(self.tech_params)
-        self.bio_params = filter_data_for_matrix(self.data_objs, "biosphere")
-        self.biosphere_dict, _, self.biosphere_matrix = MatrixBuilder.build(self.bio_params, col_dict=self.activity_dict)
-        if len(self.activity_dict) != len(self.product_dict):
+        """Load data and create technosphere and biosphere matrices.
+
+        If ``self.matrix_cache`` is set, the matrices, parameter arrays and mapping dictionaries are loaded from the cache if they were already built from the same resources, and added to the cache otherwise."""
+        self.technosphere_pattern = self.biosphere_pattern = None
+        self.forget_factorization()
+        cached = None
+        if self.matrix_cache is not None:
+            self.lci_cache_key = self.matrix_cache.key(
+                self.data_objs, ("technosphere", "biosphere"), fields=self.param_fields
+            )
+            cached = self.matrix_cache.load(self.lci_cache_key)
+
+        if cached:
+            self.set_from_cache(*cached)
+        else:
+            self.tech_params = filter_data_for_matrix(
+                self.data_objs, "technosphere", max_workers=self.max_workers,
+                fields=self.param_fields
+            )
+            self.tech_params, self.product_dict, self.activity_dict, self.technosphere_matrix = \
+                MatrixBuilder.build(self.tech_params, format=self.technosphere_format)
+            self.bio_params = filter_data_for_matrix(
+                self.data_objs, "biosphere", max_workers=self.max_workers,
+                fields=self.param_fields
+            )
+            self.bio_params, self.biosphere_dict, _, self.biosphere_matrix = \
+                MatrixBuilder.build(self.bio_params, col_dict=self.activity_dict)
+            if self.matrix_cache is not None:
+                self.matrix_cache.save(
+                    self.lci_cache_key,
+                    matrices={
+                        "technosphere_matrix": self.technosphere_matrix,
+                        "biosphere_matrix": self.biosphere_matrix,
+                    },
+                    arrays={"tech_params": self.tech_params, "bio_params": self.bio_params},
+                    dicts={
+                        "product_dict": self.product_dict,
+                        "activity_dict": self.activity_dict,
+                        "biosphere_dict": self.biosphere_dict,
+                    },
+                )
+
+        # Checked after loading from the cache too, as cache entries don't depend on ``square_technosphere``
+        if self.square_technosphere and len(self.activity_dict) != len(self.product_dict):
             raise NonsquareTechnosphere((
                 "Technosphere matrix is not square: {} activities (columns) and {} products (rows). "
                 "Use LeastSquaresLCA to solve this system, or fix the input "
                 "data").format(len(self.activity_dict), len(self.product_dict))
             )
+        if self.solver_backend is None:
+            self.solver_backend = select_solver(self.technosphere_matrix)
+        if self.foreground is not None:
+            self.set_foreground(*self.foreground)
+        self.technosphere_matrix = self.technosphere_matrix.asformat(self.technosphere_format)
 
         # if not self.biosphere_dict:
         #     warnings.warn("No biosphere flows found. No inventory results can "
@@ -147,14 +260,89 @@ class LCA(object):
             )
 
     def load_lcia_data(self):
-        """Load data and create characterization matrix.
+        """Load data and create the characterization factor vector ``self.characterization_vector``.
+
+        Uses ``self.matrix_cache`` like ``load_lci_data``.
 
         """
-        self.cf_params = filter_data_for_matrix(self.data_objs, "characterization")
-        _, _, self.characterization_matrix = MatrixBuilder.build(self.cf_params, self.biosphere_dict, one_d=True)
+        self.characterization_pattern = None
+        cached = None
+        if self.matrix_cache is not None:
+            cf_cache_key = self.matrix_cache.key(
+                self.data_objs, ("characterization",), parent=self.lci_cache_key,
+                fields=self.param_fields
+            )
+            cached = self.matrix_cache.load(cf_cache_key)
+
+        if cached:
+            self.set_from_cache(*cached)
+        else:
+            self.cf_params = filter_data_for_matrix(
+                self.data_objs, "characterization", max_workers=self.max_workers,
+                fields=self.param_fields
+            )
+            self.cf_params, _, _, self.characterization_vector = MatrixBuilder.build(
+                self.cf_params, self.biosphere_dict, one_d=True, format="vector"
+            )
+            if self.matrix_cache is not None:
+                self.matrix_cache.save(
+                    cf_cache_key,
+                    arrays={
+                        "cf_params": self.cf_params,
+                        "characterization_vector": self.characterization_vector,
+                    },
+                )
 
         if self.overrides:
             self.overrides.update_matrices(matrices=['characterization_matrix'])
+            # Copy changes made to the matrix back into the vector
+            self.characterization_matrix = self.characterization_matrix
+
+    @property
+    def characterization_matrix(self):
+        """Diagonal sparse matrix of ``self.characterization_vector``, for code which needs a matrix.
+
+        Built when first accessed after ``self.characterization_vector`` was replaced. Assigning a matrix sets ``self.characterization_vector`` to its diagonal."""
+        if not hasattr(self, "characterization_vector"):
+            raise AttributeError("Must do LCIA first")
+        cached = getattr(self, "_characterization_matrix", None)
+        if cached is None or cached[0] is not self.characterization_vector:
+            cached = self._characterization_matrix = (
+                self.characterization_vector, sparse.diags(self.characterization_vector, format="csr")
+            )
+        return cached[1]
+
+    @characterization_matrix.setter
+    def characterization_matrix(self, matrix):
+        self.characterization_vector = np.asarray(matrix.diagonal(), dtype=np.float64)
+
+    def set_foreground(self, products, activities):
+        """Solve with a foreground and background partition of the technosphere, using :class:`.solvers.SchurComplementSolver`.
+
+        Args:
+            * *products* (iterable): Product IDs in the foreground.
+            * *activities* (iterable): Activity IDs in the foreground.
+
+        The background is solved with the current solver backend. Doesn't return anything, but replaces ``self.solver_backend``.
+
+        """
+        self.foreground = (products, activities)
+        background_solver = getattr(self.solver_backend, "background_solver", self.solver_backend)
+        self.solver_backend = SchurComplementSolver(
+            IndexMapping.from_dict(self.product_dict).lookup_strict(list(products)),
+            IndexMapping.from_dict(self.activity_dict).lookup_strict(list(activities)),
+            background_solver=background_solver,
+        )
+        self.forget_factorization()
+
+    def set_from_cache(self, matrices, arrays, dicts):
+        """Set attributes from a ``MatrixCache`` entry.
+
+        Cached arrays are read-only memory maps; matrices are copied if ``overrides`` will modify them."""
+        for name, matrix in matrices.items():
+            setattr(self, name, matrix.copy() if self.overrides else matrix)
+        for name, value in list(arrays.items()) + list(dicts.items()):
+            setattr(self, name, value)
 
     # def load_normalization_data(self):
     #     """Load normalization data."""
@@ -189,12 +377,26 @@ class LCA(object):
         """
 Factorize the technosphere matrix into lower and upper triangular matrices, :math:`A=LU`. Does not solve the linear system :math:`Ax=B`.
 
-Doesn't return anything, but creates ``self.solver``.
+Uses the solver backend ``self.solver_backend``. Doesn't return anything, but creates ``self.solver``, a function which solves the linear system for a given demand array.
 
-.. warning:: Incorrect results could occur if a technosphere matrix was factorized, and then a new technosphere matrix was constructed, as ``self.solver`` would still be the factorized older technosphere matrix. You are responsible for deleting ``self.solver`` when doing these types of advanced calculations.
+If ``cache_factorization`` is set, the factorization is taken from, or added to, the process-wide ``factorization_cache``, keyed by the hash of the technosphere matrix (stored in ``self.technosphere_key``).
+
+.. warning:: Incorrect results could occur if a technosphere matrix was factorized, and then a new technosphere matrix was assigned directly to ``self.technosphere_matrix``, as ``self.solver`` would still be the factorized older technosphere matrix. ``load_lci_data`` and ``rebuild_technosphere_matrix`` remove ``self.solver``; otherwise, call ``forget_factorization``.
 
         """
-        self.solver = factorized(self.technosphere_matrix.tocsc())
+        if self.cache_factorization:
+            if getattr(self, "technosphere_key", None) is None:
+                self.technosphere_key = matrix_hash(self.technosphere_matrix)
+            self.solver = factorization_cache.factorize(
+                self.solver_backend, self.technosphere_matrix, self.technosphere_key
+            )
+        else:
+            self.solver = self.solver_backend.factorize(self.technosphere_matrix)
+
+    def forget_factorization(self):
+        """Remove ``self.solver`` and ``self.technosphere_key``, after the technosphere matrix has changed."""
+        self.__dict__.pop("solver", None)
+        self.technosphere_key = None
 
     def solve_linear_system(self):
         """
@@ -204,15 +406,17 @@ Master solution function for linear system :math:`Ax=B`.
 
     -- Nicolas Higham, Accuracy and Stability of Numerical Algorithms, Society for Industrial and Applied Mathematics, Philadelphia, PA, USA, 2002, p. 260.
 
-We use `UMFpack <http://www.cise.ufl.edu/research/sparse/umfpack/>`_, which is a very fast solver for sparse matrices.
+The solver backend is ``self.solver_backend``, set with the ``solver`` argument when creating the LCA; see :mod:`.solvers`. The default is `PARDISO <https://github.com/haasad/PyPardisoProject>`_ if installed, and otherwise SciPy, which uses `UMFpack <http://www.cise.ufl.edu/research/sparse/umfpack/>`_ if available.
 
-If the technosphere matrix has already been factorized, then the decomposed technosphere (``self.solver``) is reused. Otherwise the calculation is redone completely.
+If the technosphere matrix has already been factorized, then the decomposed technosphere (``self.solver``) is reused. Otherwise the calculation is redone completely, unless ``cache_factorization`` is set, in which case the technosphere is factorized first.
 
         """
+        if self.cache_factorization and not hasattr(self, "solver"):
+            self.decompose_technosphere()
         if hasattr(self, "solver"):
             return self.solver(self.demand_array)
         else:
-            return spsolve(
+            return self.solver_backend.solve(
                 self.technosphere_matrix,
                 self.demand_array)
 
@@ -230,7 +434,7 @@ Args:
 
 .. warning:: Custom matrix builders should inherit from ``TechnosphereBiosphereMatrixBuilder``, because technosphere inputs need to have their signs flipped to be negative, as we do :math:`A^{-1}f` directly instead of :math:`(I - A^{-1})f`.
 
-Doesn't return anything, but creates ``self.supply_array`` and ``self.inventory``.
+Doesn't return anything, but creates ``self.supply_array``, and makes ``self.inventory`` available.
 
         """
         self.load_lci_data()
@@ -246,25 +450,276 @@ Doesn't return anything, but creates ``self.supply_array`` and ``self.inventory`
 
         """
         self.supply_array = self.solve_linear_system()
-        # Turn 1-d array into diagonal matrix
-        count = len(self.activity_dict)
-        self.inventory = self.biosphere_matrix * \
-            sparse.spdiags([self.supply_array], [0], count, count)
+
+    @property
+    def inventory(self):
+        """The life cycle inventory matrix, with the biosphere flows of each activity for ``self.supply_array``.
+
+        Built lazily: only when accessed, and again only after ``self.supply_array`` or ``self.biosphere_matrix`` were replaced. Scores don't need it; see ``score``."""
+        if not hasattr(self, "supply_array"):
+            raise AttributeError("Must do lci first")
+        cached = getattr(self, "_inventory", None)
+        if cached is None or cached[0] is not self.supply_array or cached[1] is not self.biosphere_matrix:
+            # Turn 1-d array into diagonal matrix
+            count = len(self.activity_dict)
+            inventory = self.biosphere_matrix * \
+                sparse.spdiags([self.supply_array], [0], count, count)
+            cached = self._inventory = (self.supply_array, self.biosphere_matrix, inventory)
+        return cached[2]
+
+    @inventory.setter
+    def inventory(self, value):
+        self._inventory = (getattr(self, "supply_array", None), getattr(self, "biosphere_matrix", None), value)
+
+    def lci_many(self, demands, chunk_size=None):
+        """Calculate the supply arrays for many demands at once.
+
+        Builds the demand matrix in one step (see ``build_demand_matrix``), and solves for all demands with one factorization of the technosphere matrix, passing many right-hand sides to each solver call (column by column for solvers which only accept one; see :meth:`.solvers.Solver.solve_many`). LCI data is loaded, and the technosphere factorized, if needed.
+
+        Args:
+            * *demands* (list): Demand dictionaries.
+            * *chunk_size* (int, optional): Maximum number of demands per solver call, to limit the memory used for dense right-hand sides. Default is all demands at once.
+
+        Returns:
+            A NumPy array of supply arrays, with shape (# of activities, # of demands).
+
+        """
+        if not hasattr(self, "technosphere_matrix"):
+            self.load_lci_data()
+        if not hasattr(self, "solver"):
+            self.decompose_technosphere()
+        demand_matrix = self.build_demand_matrix(demands)
+        count = demand_matrix.shape[1]
+        chunk_size = chunk_size or max(count, 1)
+        supply = np.empty((len(self.activity_dict), count))
+        for start in range(0, count, chunk_size):
+            block = demand_matrix[:, start:start + chunk_size].toarray()
+            supply[:, start:start + chunk_size] = np.reshape(
+                self.solver_backend.solve_many(self.solver, block), (supply.shape[0], -1)
+            )
+        return supply
+
+    def lcia_many(self, demands, chunk_size=None):
+        """Calculate LCIA scores for many demands at once.
+
+        Like ``lci_many``, but the characterized biosphere matrix is reduced to one row vector of characterized flows per activity, so each score is a dot product with a supply array, and no inventory matrices are built. LCIA data is loaded if needed.
+
+        Args:
+            * *demands* (list): Demand dictionaries.
+            * *chunk_size* (int, optional): Maximum number of demands per solver call. If given, supply arrays are only kept in memory for one chunk at a time.
+
+        Returns:
+            A 1-dimensional NumPy array of scores, in the same order as ``demands``.
+
+        """
+        if not hasattr(self, "technosphere_matrix"):
+            self.load_lci_data()
+        if not hasattr(self, "characterization_vector"):
+            self.load_lcia_data()
+        demands = list(demands)
+        characterized_biosphere = self.characterized_biosphere_vector()
+        chunk_size = chunk_size or max(len(demands), 1)
+        return np.hstack([np.zeros(0)] + [
+            characterized_biosphere @ self.lci_many(demands[start:start + chunk_size])
+            for start in range(0, len(demands), chunk_size)
+        ])
+
+    def lci_with_edits(self, edits, demand=None, max_rank=None):
+        """Calculate the supply array after changing a few technosphere matrix values, without refactorizing.
+
+        The changed matrix is :math:`A + UV^{T}`, where :math:`U` holds the changes in the :math:`m` changed columns, and :math:`V` selects these columns. The `Sherman-Morrison-Woodbury formula <https://en.wikipedia.org/wiki/Woodbury_matrix_identity>`_ gives its solution from the existing factorization (``self.solver``), with :math:`m` more solves and a small :math:`m \\times m` dense system:
+
+        .. math::
+
+            x' = x - A^{-1}U(I + V^{T}A^{-1}U)^{-1}V^{T}x
+
+        If more than ``max_rank`` columns are changed, the changed matrix is factorized instead. ``self.technosphere_matrix`` isn't changed, and neither is an existing ``self.solver``; LCI data is loaded if needed, and if the technosphere matrix wasn't factorized yet, its factorization is created and kept in ``self.solver`` for later calls.
+
+        Args:
+            * *edits* (iterable): ``(product ID, activity ID, new value)`` tuples. Values are technosphere matrix values, i.e. inputs are negative.
+            * *demand* (dict, optional): Demand dictionary. Default is ``self.demand_array``.
+            * *max_rank* (int, optional): Default is ``self.max_update_rank``.
+
+        Returns:
+            The new supply array.
+
+        """
+        if not hasattr(self, "technosphere_matrix"):
+            self.load_lci_data()
+        if demand is None:
+            if not hasattr(self, "demand_array"):
+                self.build_demand_array()
+            demand_array = self.demand_array
+        else:
+            demand_array = self.build_demand_matrix([demand]).toarray().ravel()
+
+        # Later edits of the same value win
+        edits = {(row, col): value for row, col, value in edits}
+        rows = IndexMapping.from_dict(self.product_dict).lookup_strict([row for row, _ in edits])
+        cols = IndexMapping.from_dict(self.activity_dict).lookup_strict([col for _, col in edits])
+        rows, cols = rows.astype(np.int64), cols.astype(np.int64)
+        changes = np.fromiter(edits.values(), dtype=np.float64, count=len(edits))
+        if len(edits):
+            changes -= np.asarray(self.technosphere_matrix[rows, cols]).ravel()
+        changed_cols, positions = np.unique(cols, return_inverse=True)
+        updates = sparse.csc_matrix(
+            (changes, (rows, positions)), shape=(self.technosphere_matrix.shape[0], len(changed_cols))
+        )
+
+        if len(changed_cols) > (self.max_update_rank if max_rank is None else max_rank):
+            selection = sparse.csr_matrix(
+                (np.ones(len(changed_cols)), (np.arange(len(changed_cols)), changed_cols)),
+                shape=(len(changed_cols), self.technosphere_matrix.shape[1])
+            )
+            matrix = self.technosphere_matrix + updates @ selection
+            return self.solver_backend.solve(matrix, demand_array)
+
+        if not hasattr(self, "solver"):
+            self.decompose_technosphere()
+        supply = np.ravel(self.solver(demand_array))
+        if not len(changed_cols):
+            return supply
+        corrections = np.reshape(
+            self.solver_backend.solve_many(self.solver, updates.toarray()), updates.shape
+        )
+        capacitance = np.eye(len(changed_cols)) + corrections[changed_cols]
+        return supply - corrections @ np.linalg.solve(capacitance, supply[changed_cols])
+
+    def lcia_with_edits(self, edits, demand=None, max_rank=None):
+        """Calculate the LCIA score after changing a few technosphere matrix values, without refactorizing.
+
+        See ``lci_with_edits`` for the arguments. LCIA data is loaded if needed.
+
+        Returns:
+            The new score as a ``float``.
+
+        """
+        supply = self.lci_with_edits(edits, demand=demand, max_rank=max_rank)
+        if not hasattr(self, "characterization_vector"):
+            self.load_lcia_data()
+        return float(self.characterized_biosphere_vector() @ supply)
+
+    def power_series_lcia(self, tolerance=1e-6, max_tiers=100, keep_tiers=False):
+        """Approximate the LCIA score with a truncated power (Neumann) series, without factorizing the technosphere matrix.
+
+        The technosphere matrix is split into its diagonal of production amounts :math:`D` and the inputs per unit of production, :math:`Q = I - AD^{-1}`, so :math:`x = D^{-1}(I - Q)^{-1}f = D^{-1}\\sum_k Q^k f`. Tier :math:`k` is :math:`t_k = Q^k f`, i.e. the products needed :math:`k` steps up the supply chain, and only needs one sparse matrix-vector product.
+
+        If :math:`q = ||Q||_1 < 1`, the remainder after tier :math:`K` is bounded by :math:`||t_K||_1 q / (1 - q)`, which gives rigorous bounds on the errors of the score and supply array. Tiers are added until the score bound is at most ``tolerance`` times the score, ``max_tiers`` is reached, or the series ends, as it does for acyclic supply chains. If :math:`q \\geq 1`, e.g. when the inputs of an activity outweigh its output, there is no bound, and tiers are added until a tier changes both the 1-norm of the supply array and the (nonzero) score by at most ``tolerance`` times their totals; a tier with zero score, e.g. before the supply chain reaches any emissions, never ends the series.
+
+        LCI and LCIA data are loaded, and the demand array built, if needed.
+
+        Args:
+            * *tolerance* (float): Relative tolerance of the score.
+            * *max_tiers* (int): Maximum number of tiers. Must be at least 1, as tier 0 is the demand itself.
+            * *keep_tiers* (bool): Keep the supply array of each tier in ``self.tiers``.
+
+        Doesn't set ``self.inventory`` or ``self.characterized_inventory``, but creates ``self.supply_array`` (approximate), ``self.tier_scores`` (the score of each tier), ``self.score_error_bound`` and ``self.supply_error_bound`` (on the 1-norm of the supply array error; both ``inf`` if :math:`q \\geq 1`), and ``self.tiers`` if ``keep_tiers``.
+
+        Returns:
+            The approximate score as a ``float``.
+
+        """
+        if max_tiers < 1:
+            raise ValueError("`max_tiers` must be at least 1")
+        if not hasattr(self, "technosphere_matrix"):
+            self.load_lci_data()
+        if not hasattr(self, "characterization_vector"):
+            self.load_lcia_data()
+        if not hasattr(self, "demand_array"):
+            self.build_demand_array()
+
+        production = self.technosphere_matrix.diagonal()
+        if not production.all():
+            raise ValueError("Power series needs nonzero production amounts on the technosphere diagonal")
+        inputs = self.technosphere_matrix - sparse.diags(production)
+        Q = -(inputs @ sparse.diags(1 / production)).tocsr()
+        Q.eliminate_zeros()
+        q = float(abs(Q).sum(axis=0).max()) if Q.nnz else 0.
+        # Bound multiplier on the remainder, given the last tier
+        remainder = q / (1 - q) if q < 1 else np.inf
+
+        characterized = self.characterized_biosphere_vector() / production
+        largest_characterized = np.abs(characterized).max() if len(characterized) else 0.
+        tier = np.asarray(self.demand_array, dtype=np.float64)
+        total = np.zeros(len(tier))
+        tier_scores, tiers = [], []
+        score = 0.
+        for count in range(max_tiers):
+            if count:
+                tier = Q @ tier
+            total += tier
+            tier_score = float(characterized @ tier)
+            tier_scores.append(tier_score)
+            score += tier_score
+            if keep_tiers:
+                tiers.append(tier / production)
+            tier_norm = np.abs(tier).sum()
+            if not tier_norm:
+                break
+            if np.isfinite(remainder):
+                if largest_characterized * remainder * tier_norm <= tolerance * abs(score):
+                    break
+            elif (
+                score
+                and tier_norm <= tolerance * np.abs(total).sum()
+                and abs(tier_score) <= tolerance * abs(score)
+            ):
+                break
+
+        bound = remainder * tier_norm if tier_norm else 0.
+        self.supply_array = total / production
+        self.tier_scores = np.array(tier_scores)
+        self.score_error_bound = float(largest_characterized * bound)
+        self.supply_error_bound = float(np.abs(1 / production).max() * bound)
+        if keep_tiers:
+            self.tiers = tiers
+        return score
+
+    def characterized_biosphere_vector(self):
+        """Sum the characterized biosphere matrix over flows, giving the direct characterized emissions of one unit of each activity.
+
+        Not cached: it is one sparse matrix-vector product, and recomputing it picks up in-place changes to the matrices, e.g. from ``overrides`` or presamples.
+
+        Returns:
+            A 1-dimensional NumPy array with length (# of activities)
+
+        """
+        return np.asarray(self.biosphere_matrix.T @ self.characterization_vector).ravel()
+
+    def activity_scores(self):
+        """Calculate the cumulative LCIA score of one unit of each product, with one solve.
+
+        Solves the transposed (adjoint) system :math:`A^{T}y = (CB)^{T}`, summed over flows, reusing the factorization of the technosphere matrix (``self.solver``) where the solver backend supports transposed solves (see :meth:`.solvers.Solver.transposed`). LCI and LCIA data are loaded, and the technosphere factorized, if needed.
+
+        The score of any demand is then a dot product, e.g. ``lca.activity_scores() @ lca.demand_array``.
+
+        Returns:
+            A 1-dimensional NumPy array with length (# of products), in the order of ``self.product_dict``.
+
+        """
+        if not hasattr(self, "technosphere_matrix"):
+            self.load_lci_data()
+        if not hasattr(self, "characterization_vector"):
+            self.load_lcia_data()
+        if not hasattr(self, "solver"):
+            self.decompose_technosphere()
+        solve = self.solver_backend.transposed(self.solver, self.technosphere_matrix)
+        return np.ravel(solve(self.characterized_biosphere_vector()))
 
     def lcia(self):
         """
 Calculate the life cycle impact assessment.
 
-#. Load and construct the characterization matrix
-#. Multiply the characterization matrix by the life cycle inventory
+#. Load and construct the characterization factor vector
+#. Multiply the characterization factors by the life cycle inventory
 
 Args:
     * *builder* (``MatrixBuilder`` object, optional): Default is ``bw2calc.matrices.MatrixBuilder``, which is fine for most cases. Custom matrix builders can be used to manipulate data in creative ways before building the characterization matrix.
 
-Doesn't return anything, but creates ``self.characterized_inventory``.
+Doesn't return anything, but makes ``self.characterized_inventory`` and ``self.score`` available.
 
         """
-        assert hasattr(self, "inventory"), "Must do lci first"
+        assert hasattr(self, "supply_array"), "Must do lci first"
         self.load_lcia_data()
         self.lcia_calculation()
 
@@ -274,8 +729,32 @@ Doesn't return anything, but creates ``self.characterized_inventory``.
         Separated from ``lcia`` to be reusable in cases where the matrices are already built, e.g. ``redo_lcia`` and Monte Carlo classes.
 
         """
-        self.characterized_inventory = \
-            self.characterization_matrix * self.inventory
+        # Results are for the matrices and supply array of this calculation, even if these change later
+        self._lcia_inputs = (
+            self.characterization_vector, self.biosphere_matrix, self.supply_array,
+            self.characterized_biosphere_vector()
+        )
+        self._characterized_inventory = None
+
+    @property
+    def characterized_inventory(self):
+        """The characterized inventory matrix, with the characterized biosphere flows of each activity, from the last LCIA calculation.
+
+        Built lazily, when first accessed after each LCIA calculation. Scores don't need it; see ``score``."""
+        if getattr(self, "_characterized_inventory", None) is None:
+            if getattr(self, "_lcia_inputs", None) is None:
+                raise AttributeError("Must do LCIA first")
+            characterization_vector, biosphere_matrix, supply_array, _ = self._lcia_inputs
+            count = len(supply_array)
+            characterized = (biosphere_matrix * sparse.spdiags([supply_array], [0], count, count)).tocsr()
+            # Scale each row (biosphere flow) by its characterization factor
+            characterized.data *= np.repeat(characterization_vector, np.diff(characterized.indptr))
+            self._characterized_inventory = characterized
+        return self._characterized_inventory
+
+    @characterized_inventory.setter
+    def characterized_inventory(self, value):
+        self._characterized_inventory = value
 
     def normalize(self):
         """Multiply characterized inventory by flow-specific normalization factors."""
@@ -317,12 +796,15 @@ Doesn't return anything, but creates ``self.characterized_inventory``.
 The LCIA score as a ``float``.
 
 Note that this is a `property <http://docs.python.org/2/library/functions.html#property>`_, so it is ``foo.lca``, not ``foo.score()``
+
+Calculated as the dot product of ``characterized_biosphere_vector`` and the supply array of the last LCIA calculation, so neither the inventory nor the characterized inventory matrix is built.
         """
-        assert hasattr(self, "characterized_inventory"), "Must do LCIA first"
+        assert getattr(self, "_lcia_inputs", None) is not None, "Must do LCIA first"
         # if self.weighting:
         #     assert hasattr(self, "weighted_inventory"), "Must do weighting first"
         #     return float(self.weighted_inventory.sum())
-        return float(self.characterized_inventory.sum())
+        _, _, supply_array, characterized_biosphere = self._lcia_inputs
+        return float(characterized_biosphere @ supply_array)
 
     #########################
     ### Redo calculations ###
@@ -334,11 +816,20 @@ Note that this is a `property <http://docs.python.org/2/library/functions.html#p
         Args:
             * *vector* (array): 1-dimensional NumPy array with length (# of technosphere parameters), in same order as ``self.tech_params``.
 
-        Doesn't return anything, but overwrites ``self.technosphere_matrix``.
+        The matrix structure is computed once, and stored in ``self.technosphere_pattern`` (see :class:`.matrices.SparsityPattern`); later rebuilds only compute the matrix values.
+
+        Doesn't return anything, but overwrites ``self.technosphere_matrix``, and removes the factorization of the old matrix (see ``forget_factorization``).
 
         """
+        self.forget_factorization()
+        if getattr(self, "technosphere_pattern", None) is None:
+            self.technosphere_pattern = MatrixBuilder.build_pattern(
+                self.tech_params, self.product_dict, self.activity_dict,
+                format=self.technosphere_format
+            )
         self.technosphere_matrix = MatrixBuilder.build_matrix(
-            self.tech_params, self.product_dict, self.activity_dict, new_data=vector
+            self.tech_params, self.product_dict, self.activity_dict, new_data=vector,
+            pattern=self.technosphere_pattern
         )
 
     def rebuild_biosphere_matrix(self, vector):
@@ -347,24 +838,38 @@ Note that this is a `property <http://docs.python.org/2/library/functions.html#p
         Args:
             * *vector* (array): 1-dimensional NumPy array with length (# of biosphere parameters), in same order as ``self.bio_params``.
 
+        The matrix structure is computed once, and stored in ``self.biosphere_pattern`` (see :class:`.matrices.SparsityPattern`); later rebuilds only compute the matrix values.
+
         Doesn't return anything, but overwrites ``self.biosphere_matrix``.
 
         """
+        if getattr(self, "biosphere_pattern", None) is None:
+            self.biosphere_pattern = MatrixBuilder.build_pattern(
+                self.bio_params, self.biosphere_dict, self.activity_dict
+            )
         self.biosphere_matrix = MatrixBuilder.build_matrix(
-            self.bio_params, self.biosphere_dict, self.activity_dict, new_data=vector
+            self.bio_params, self.biosphere_dict, self.activity_dict, new_data=vector,
+            pattern=self.biosphere_pattern
         )
 
     def rebuild_characterization_matrix(self, vector):
-        """Build a new characterization matrix using the same row and column indices, but different values. Useful for Monte Carlo iteration or sensitivity analysis.
+        """Build a new characterization factor vector using the same indices, but different values. Useful for Monte Carlo iteration or sensitivity analysis.
 
         Args:
             * *vector* (array): 1-dimensional NumPy array with length (# of characterization parameters), in same order as ``self.cf_params``.
 
-        Doesn't return anything, but overwrites ``self.characterization_matrix``.
+        The indices are checked once, and stored in ``self.characterization_pattern`` (see :class:`.matrices.VectorPattern`); later rebuilds are an array assignment.
+
+        Doesn't return anything, but overwrites ``self.characterization_vector``.
 
         """
-        self.characterization_matrix = MatrixBuilder.build_matrix(
-            self.cf_params, self.biosphere_dict, one_d=True, new_data=vector
+        if getattr(self, "characterization_pattern", None) is None:
+            self.characterization_pattern = MatrixBuilder.build_pattern(
+                self.cf_params, self.biosphere_dict, one_d=True, format="vector"
+            )
+        self.characterization_vector = MatrixBuilder.build_matrix(
+            self.cf_params, self.biosphere_dict, one_d=True, new_data=vector,
+            pattern=self.characterization_pattern
         )
 
     def redo_lci(self, demand=None):
@@ -378,7 +883,7 @@ Note that this is a `property <http://docs.python.org/2/library/functions.html#p
         .. warning:: If you want to redo the LCIA as well, use ``redo_lcia(demand)`` directly.
 
         """
-        assert hasattr(self, "inventory"), "Must do lci first"
+        assert hasattr(self, "supply_array"), "Must do lci first"
         if demand is not None:
             self.build_demand_array(demand)
         self.lci_calculation()
@@ -393,7 +898,7 @@ Note that this is a `property <http://docs.python.org/2/library/functions.html#p
         Doesn't return anything, but overwrites ``self.characterized_inventory``. If ``demand`` is given, also overwrites ``self.demand_array``, ``self.supply_array``, and ``self.inventory``.
 
         """
-        assert hasattr(self, "characterized_inventory"), "Must do LCIA first"
+        assert getattr(self, "_lcia_inputs", None) is not None, "Must do LCIA first"
         if demand is not None:
             self.redo_lci(demand)
         self.lcia_calculation()
@@ -1,12 +1,18 @@
+from .caching import factorization_cache
 from .errors import EfficiencyWarning, NoSolutionFound
 from .lca import LCA
 from scipy.sparse.linalg import lsqr, lsmr
+import inspect
 import warnings
 
 
 class LeastSquaresLCA(LCA):
     """Solve overdetermined technosphere matrix with more products than activities using least-squares approximation.
 
+    By default, each demand is solved with an iterative least-squares solver (``lsmr``). If ``warm_start``, the previous solution is the initial guess for the next one, which helps when the technosphere changes little between solves, e.g. in Monte Carlo.
+
+    With ``factorize=True`` in ``lci``, or after ``decompose_technosphere``, the normal equations :math:`A^{T}Ax = A^{T}f` are factorized once with the solver backend, and later demands only need the solves with the factors. This squares the condition number of the technosphere matrix, so is best for well-conditioned systems solved for many demands.
+
     See also:
 
     * `Multioutput processes in LCA <http://chris.mutel.org/multioutput.html>`_
@@ -14,17 +20,51 @@ class LeastSquaresLCA(LCA):
     * `Another least-squares algorithm in SciPy <http://docs.scipy.org/doc/scipy/reference/generated/scipy.sparse.linalg.lsqr.html#scipy.sparse.linalg.lsqr>`_
 
     """
+    square_technosphere = False
+
+    def __init__(self, demand, data_objs, *args, warm_start=False, **kwargs):
+        super().__init__(demand, data_objs, *args, **kwargs)
+        self.warm_start = warm_start
+        self.guess = None
+
+    def decompose_technosphere(self):
+        """Factorize the normal equations :math:`A^{T}A`. Creates ``self.solver``, which solves the least-squares problem for a given demand array."""
+        transposed = self.technosphere_matrix.T.tocsr()
+        normal = self.solver_backend.prepare(transposed @ self.technosphere_matrix)
+        if self.cache_factorization:
+            factorization = factorization_cache.factorize(self.solver_backend, normal)
+        else:
+            factorization = self.solver_backend.factorize(normal)
+        self.solver = lambda demand_array: factorization(transposed @ demand_array)
+
     def solve_linear_system(self, solver=lsmr):
         if self.technosphere_matrix.shape[0] == self.technosphere_matrix.shape[1]:
             warnings.warn("Don't use LeastSquaresLCA for square matrices",
                           EfficiencyWarning)
-        self.solver_results = solver(
-            self.technosphere_matrix,
-            self.demand_array
-        )
-        if self.solver_results[1] not in {1, 2}:
+        if self.cache_factorization and not hasattr(self, "solver"):
+            self.decompose_technosphere()
+        if hasattr(self, "solver"):
+            return self.solver(self.demand_array)
+
+        x0 = self.guess if self.warm_start else None
+        if x0 is not None and "x0" in inspect.signature(solver).parameters:
+            self.solver_results = solver(self.technosphere_matrix, self.demand_array, x0=x0)
+        elif x0 is not None:
+            # Solve for the correction to the guess
+            residual = self.demand_array - self.technosphere_matrix @ x0
+            self.solver_results = solver(self.technosphere_matrix, residual)
+            self.solver_results = (x0 + self.solver_results[0],) + tuple(self.solver_results[1:])
+        else:
+            self.solver_results = solver(
+                self.technosphere_matrix,
+                self.demand_array
+            )
+        # 0 means that the initial guess is already the exact solution
+        if self.solver_results[1] not in ({0, 1, 2} if x0 is not None else {1, 2}):
             warnings.warn(
                 "No suitable solution found - supply array is probably nonsense",
                 NoSolutionFound
             )
+        if self.warm_start:
+            self.guess = self.solver_results[0]
         return self.solver_results[0]
@@ -29,9 +29,11 @@ and not:
     mb.build(args)
 
     """
+    #: Parameter array fields used to build matrices
+    fields = ("row_value", "col_value", "row_index", "col_index", "amount", "flip")
 
     @classmethod
-    def build(cls, array, row_dict=None, col_dict=None, one_d=False, drop_missing=True):
+    def build(cls, array, row_dict=None, col_dict=None, one_d=False, drop_missing=True, format="csr"):
         """
 Build a sparse matrix from NumPy structured array(s).
 
@@ -60,11 +62,19 @@ Args:
     * *col_dict* (dict, optional): Mapping dictionary linking ``"col_value"`` values to ``"col_index"`` values. Will be built if not given.
     * *one_d* (bool): Build diagonal matrix.
     * *drop_missing* (bool): Remove rows from the parameter array which aren't mapped by ``row_dict`` or ``col_dict``. Default is ``True``. Advanced use only.
+    * *format* (str): Sparse matrix format, ``"csr"`` (default) or ``"csc"``. The matrix is built directly in this format. If ``one_d``, can also be ``"vector"``, for a dense 1-dimensional array of the diagonal values.
 
 Returns:
-    A :ref:`numpy parameter array <building-matrices>`, the row mapping dictionary, the column mapping dictionary, and a COO sparse matrix.
+    A :ref:`numpy parameter array <building-matrices>`, the row mapping dictionary, the column mapping dictionary, and a sparse matrix in ``format`` (or a NumPy array for ``"vector"``).
+
+    The returned parameter array has matrix indices for each row, and only includes mapped rows if ``drop_missing``. Read-only input arrays, e.g. memory maps, are copied before indexing; other arrays are indexed in place.
 
         """
+        if not array.flags.writeable:
+            # Read-only (e.g. memory-mapped) arrays are shared; matrix indices
+            # are written into a single private copy
+            array = np.array(array)
+
         if not row_dict:
             row_dict = index_with_searchsorted(
                 array["row_value"],
@@ -81,8 +91,10 @@ Returns:
             # Eliminate references to row data which isn't used;
             # Unused data remains MAX_SIGNED_32BIT_INT values
             if drop_missing:
-                array = array[np.where(array["row_index"] != MAX_SIGNED_32BIT_INT)]
-            matrix = cls.build_matrix(array, row_dict, one_d=True)
+                mask = array["row_index"] != MAX_SIGNED_32BIT_INT
+                if not mask.all():
+                    array = array[mask]
+            matrix = cls.build_matrix(array, row_dict, one_d=True, format=format)
         else:
             if not col_dict:
                 col_dict = index_with_searchsorted(
@@ -97,27 +109,145 @@ Returns:
                 )
 
             if drop_missing:
-                array = array[np.where(array["row_index"] != MAX_SIGNED_32BIT_INT)]
-                array = array[np.where(array["col_index"] != MAX_SIGNED_32BIT_INT)]
+                mask = (array["row_index"] != MAX_SIGNED_32BIT_INT) & \
+                    (array["col_index"] != MAX_SIGNED_32BIT_INT)
+                if not mask.all():
+                    array = array[mask]
 
-            matrix = cls.build_matrix(array, row_dict, col_dict)
-        return row_dict, col_dict, matrix
+            matrix = cls.build_matrix(array, row_dict, col_dict, format=format)
+        return array, row_dict, col_dict, matrix
 
     @classmethod
-    def build_matrix(cls, array, row_dict, col_dict=None, one_d=False, new_data=None):
-        """Build sparse matrix."""
+    def build_pattern(cls, array, row_dict, col_dict=None, one_d=False, format="csr"):
+        """Build a :class:`SparsityPattern` for the matrix indices of the parameter array ``array``.
+
+        Arguments are the same as for :meth:`build_matrix`. Returns a :class:`VectorPattern` for one-dimensional ``"vector"`` format."""
+        if one_d and format == "vector":
+            return VectorPattern(array["row_index"], len(row_dict), array["flip"])
+        elif one_d:
+            return SparsityPattern(
+                array["row_index"], array["row_index"],
+                (len(row_dict), len(row_dict)), array["flip"], format=format
+            )
+        else:
+            return SparsityPattern(
+                array["row_index"], array["col_index"],
+                (len(row_dict), len(col_dict)), array["flip"], format=format
+            )
+
+    @classmethod
+    def build_matrix(cls, array, row_dict, col_dict=None, one_d=False, new_data=None, pattern=None, format="csr"):
+        """Build sparse matrix in ``format`` (``"csr"`` or ``"csc"``), or, if ``one_d`` and ``format`` is ``"vector"``, a dense array of the diagonal values.
+
+        If ``pattern`` (from :meth:`build_pattern` for the same ``array``) is given, only the matrix values are computed, and the matrix has the format of the pattern."""
+        if pattern is not None:
+            return pattern.matrix(array["amount"] if new_data is None else new_data)
         vector = (array["amount"] if new_data is None else new_data).copy()
         assert vector.shape[0] == array.shape[0], "Incompatible data & indices"
         vector[array["flip"]] *= -1
         # coo_matrix construction is coo_matrix((values, (rows, cols)),
         # (row_count, col_count))
-        if one_d:
+        if one_d and format == "vector":
+            return np.bincount(
+                array["row_index"], weights=vector.astype(np.float64), minlength=len(row_dict)
+            )
+        elif one_d:
             return sparse.coo_matrix((
                 vector.astype(np.float64),
                 (array["row_index"], array["row_index"])),
-                (len(row_dict), len(row_dict))).tocsr()
+                (len(row_dict), len(row_dict))).asformat(format)
         else:
             return sparse.coo_matrix((
                 vector.astype(np.float64),
                 (array["row_index"], array["col_index"])),
-                (len(row_dict), len(col_dict))).tocsr()
+                (len(row_dict), len(col_dict))).asformat(format)
+
+
+class SparsityPattern(object):
+    """The fixed structure of a CSR or CSC matrix built from parameter arrays, for fast rebuilds with new values.
+
+    Stores the ``indices`` and ``indptr``, and the position in ``data`` of each parameter, with duplicate (row, col) parameters mapped to the same position. Building a matrix with new values is then a single ``np.bincount``, without the sorting and duplicate summing of ``coo_matrix(...).tocsr()``. The result is the same, including explicit zeros.
+
+    Args:
+        * *rows* (array): Row index of each parameter.
+        * *cols* (array): Column index of each parameter.
+        * *shape* (tuple): Matrix shape.
+        * *flip* (array, optional): Boolean array; parameters whose sign is flipped.
+        * *format* (str): ``"csr"`` (default) or ``"csc"``.
+
+    """
+    def __init__(self, rows, cols, shape, flip=None, format="csr"):
+        if format not in ("csr", "csc"):
+            raise ValueError(f"Unsupported sparse format: '{format}'")
+        self.format = format
+        self.shape = tuple(shape)
+
+        # Compress along rows for CSR, along columns for CSC
+        major = np.asarray(rows if format == "csr" else cols, dtype=np.int64)
+        minor = np.asarray(cols if format == "csr" else rows, dtype=np.int64)
+        major_count = self.shape[0] if format == "csr" else self.shape[1]
+
+        order = np.lexsort((minor, major))
+        sorted_major, sorted_minor = major[order], minor[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (sorted_major[1:] != sorted_major[:-1]) | (sorted_minor[1:] != sorted_minor[:-1])
+
+        self.nnz = int(first.sum())
+        self.positions = np.empty(len(order), dtype=np.intp)
+        self.positions[order] = np.cumsum(first) - 1
+        self.indices = sorted_minor[first].astype(np.int32)
+        self.indptr = np.zeros(major_count + 1, dtype=np.int32)
+        np.cumsum(
+            np.bincount(sorted_major[first], minlength=major_count),
+            out=self.indptr[1:]
+        )
+        self.signs = None
+        if flip is not None and np.any(flip):
+            self.signs = np.where(flip, -1.0, 1.0)
+
+    def data(self, vector):
+        """Get the ``data`` array for parameter values ``vector``."""
+        assert len(vector) == len(self.positions), "Incompatible data & indices"
+        if self.signs is not None:
+            vector = vector * self.signs
+        return np.bincount(self.positions, weights=vector, minlength=self.nnz)
+
+    def matrix(self, vector):
+        """Build a matrix for parameter values ``vector``. The ``indices`` and ``indptr`` arrays are shared between matrices."""
+        cls = sparse.csr_matrix if self.format == "csr" else sparse.csc_matrix
+        matrix = cls((self.data(vector), self.indices, self.indptr), shape=self.shape)
+        matrix.has_sorted_indices = True
+        return matrix
+
+
+class VectorPattern(object):
+    """The fixed indices of a dense vector built from parameter arrays, e.g. characterization factors, for fast rebuilds with new values.
+
+    If each index has at most one parameter, as is usual, building a vector with new values is a single array assignment; otherwise, values with the same index are summed.
+
+    Args:
+        * *rows* (array): Index of each parameter.
+        * *size* (int): Vector length.
+        * *flip* (array, optional): Boolean array; parameters whose sign is flipped.
+
+    """
+    format = "vector"
+
+    def __init__(self, rows, size, flip=None):
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.size = size
+        self.unique = len(np.unique(self.rows)) == len(self.rows)
+        self.signs = None
+        if flip is not None and np.any(flip):
+            self.signs = np.where(flip, -1.0, 1.0)
+
+    def matrix(self, vector):
+        """Build a vector for parameter values ``vector``."""
+        assert len(vector) == len(self.rows), "Incompatible data & indices"
+        if self.signs is not None:
+            vector = vector * self.signs
+        if not self.unique:
+            return np.bincount(self.rows, weights=vector, minlength=self.size)
+        result = np.zeros(self.size)
+        result[self.rows] = vector
+        return result
@@ -1,26 +1,34 @@
 from .lca import LCA
+from .solvers import KrylovSolver, SuperLUSolver, tolerance_kwargs
 from .utils import get_seed
 from contextlib import contextmanager
+from scipy.sparse import linalg as sparse_linalg
 from scipy.sparse.linalg import iterative
 from stats_arrays.random import MCRandomNumberGenerator
+import inspect
 import multiprocessing
+import numpy as np
 import sys
 
-try:
-    from pypardiso import spsolve
-except ImportError:
-    from scipy.sparse.linalg import spsolve
-
 
 class MonteCarloLCA(LCA):
-    """Monte Carlo uncertainty analysis with separate `random number generators <http://en.wikipedia.org/wiki/Random_number_generation>`_ (RNGs) for each set of parameters."""
-    def __init__(self, demand, data_objs, seed=None, *args, **kwargs):
+    """Monte Carlo uncertainty analysis with separate `random number generators <http://en.wikipedia.org/wiki/Random_number_generation>`_ (RNGs) for each set of parameters.
+
+    If ``fixed_ordering``, the fill-reducing column ordering of the technosphere matrix is computed once in ``load_data``, and each iteration only does the numeric factorization with SuperLU (see :meth:`.solvers.SuperLUSolver.with_ordering`). The sparsity pattern doesn't change between samples, so the ordering stays valid."""
+    # Uncertainty fields are needed to sample parameters
+    param_fields = None
+
+    def __init__(self, demand, data_objs, seed=None, *args, fixed_ordering=False, **kwargs):
         self.seed = seed or get_seed()
+        self.fixed_ordering = fixed_ordering
         super().__init__(demand, data_objs, seed=self.seed, *args, **kwargs)
         self.logger.info("Seeded RNGs", extra={'seed': self.seed})
 
     def load_data(self):
         self.load_lci_data()
+        if self.fixed_ordering:
+            self.solver_backend = SuperLUSolver.with_ordering(self.technosphere_matrix)
+            self.technosphere_matrix = self.technosphere_matrix.asformat(self.technosphere_format)
         self.tech_rng = MCRandomNumberGenerator(self.tech_params, seed=self.seed)
         self.bio_rng = MCRandomNumberGenerator(self.bio_params, seed=self.seed)
         if self.lcia:
@@ -50,6 +58,8 @@ class MonteCarloLCA(LCA):
 
         if self.overrides:
             self.overrides.update_matrices()
+            # Copy changes made to the matrix back into the vector
+            self.characterization_matrix = self.characterization_matrix
 
         if not hasattr(self, "demand_array"):
             self.build_demand_array()
@@ -65,30 +75,96 @@ class MonteCarloLCA(LCA):
 
 
 class IterativeMonteCarloLCA(MonteCarloLCA):
-    """Use iterative techniques instead of `LU factorization <http://en.wikipedia.org/wiki/LU_decomposition>`_ in Monte Carlo."""
-    def __init__(self, demand, data_objs, iter_solver=iterative.cgs, *args, **kwargs):
+    """Use iterative techniques instead of `LU factorization <http://en.wikipedia.org/wiki/LU_decomposition>`_ in Monte Carlo.
+
+    The first sample is solved directly, and its supply array is the initial guess for the iterative solver in later samples. If the iterative solver doesn't converge, the sample is solved directly instead.
+
+    If ``use_preconditioner``, an incomplete LU (ILU) preconditioner is built from the first iteratively solved technosphere matrix, and reused for later samples. It is rebuilt when the solver doesn't converge, or needs more than ``refresh_ratio`` times the iterations it needed right after the preconditioner was built.
+
+    Convergence is recorded in ``self.telemetry``, a dictionary with:
+
+    * *iterations*: list of iteration counts, one per iterative solve
+    * *residuals*: list of relative residual norms :math:`||b - Ax|| / ||b||`, one per iterative solve
+    * *fallbacks*: number of iterative solves which didn't converge, and were solved directly
+    * *direct_solves*: number of direct solves, including the first sample and fallbacks
+    * *preconditioner_builds*: number of times the preconditioner was built
+
+    Args:
+        * *iter_solver* (function or str): SciPy iterative solver, or its name, e.g. ``"cgs"`` (default), ``"gmres"``, ``"bicgstab"``.
+        * *use_preconditioner* (bool): Use a reusable ILU preconditioner.
+        * *maxiter* (int): Maximum iterations per solve.
+        * *tol* (float): Relative tolerance of the residual.
+        * *refresh_ratio* (float): Rebuild the preconditioner when the iterations increase by this factor.
+
+    """
+    def __init__(self, demand, data_objs, iter_solver=iterative.cgs, *args, use_preconditioner=False, maxiter=1000, tol=1e-5, refresh_ratio=2., **kwargs):
         super().__init__(demand, data_objs, *args, **kwargs)
+        if isinstance(iter_solver, str):
+            iter_solver = getattr(sparse_linalg, iter_solver)
         self.iter_solver = iter_solver
+        self.use_preconditioner = use_preconditioner
+        self.maxiter = maxiter
+        self.tol = tol
+        self.refresh_ratio = refresh_ratio
         self.guess = None
+        self.preconditioner = None
+        self.baseline_iterations = None
+        self.telemetry = {
+            "iterations": [],
+            "residuals": [],
+            "fallbacks": 0,
+            "direct_solves": 0,
+            "preconditioner_builds": 0,
+        }
+
+    def direct_solve(self):
+        self.telemetry["direct_solves"] += 1
+        return self.solver_backend.solve(self.technosphere_matrix, self.demand_array)
+
+    def build_preconditioner(self):
+        """Build the ILU preconditioner from the current technosphere matrix."""
+        self.preconditioner = KrylovSolver().preconditioner(self.technosphere_matrix)
+        self.baseline_iterations = None
+        self.telemetry["preconditioner_builds"] += 1
 
     def solve_linear_system(self):
         if not self.iter_solver or self.guess is None:
-            self.guess = spsolve(
-                self.technosphere_matrix,
-                self.demand_array)
+            self.guess = self.direct_solve()
             return self.guess
-        else:
-            solution, status = self.iter_solver(
-                self.technosphere_matrix,
-                self.demand_array,
-                x0=self.guess,
-                maxiter=1000)
-            if status != 0:
-                return spsolve(
-                    self.technosphere_matrix,
-                    self.demand_array
-                )
-            return solution
+
+        if self.use_preconditioner and self.preconditioner is None:
+            self.build_preconditioner()
+
+        iterations = []
+        kwargs = tolerance_kwargs(self.iter_solver, self.tol)
+        if "callback_type" in inspect.signature(self.iter_solver).parameters:
+            # Count GMRES iterations, not restart cycles
+            kwargs["callback_type"] = "pr_norm"
+        solution, status = self.iter_solver(
+            self.technosphere_matrix,
+            self.demand_array,
+            x0=self.guess,
+            M=self.preconditioner,
+            maxiter=self.maxiter,
+            callback=lambda _: iterations.append(None),
+            **kwargs
+        )
+        residual = np.linalg.norm(self.demand_array - self.technosphere_matrix @ solution)
+        self.telemetry["iterations"].append(len(iterations))
+        self.telemetry["residuals"].append(residual / (np.linalg.norm(self.demand_array) or 1.))
+
+        if status != 0:
+            self.telemetry["fallbacks"] += 1
+            # Convergence failed; rebuild the preconditioner for the next sample
+            self.preconditioner = None
+            return self.direct_solve()
+
+        if self.preconditioner is not None:
+            if self.baseline_iterations is None:
+                self.baseline_iterations = len(iterations)
+            elif len(iterations) > self.refresh_ratio * max(self.baseline_iterations, 1):
+                self.preconditioner = None
+        return solution
 
 
 # class ComparativeMonteCarlo(IterativeMonteCarlo):
@@ -132,13 +208,14 @@ class IterativeMonteCarloLCA(MonteCarloLCA):
 
 def single_worker(args):
     lca_args, iterations = args
-    mc = MonteCarloLCA(*lca_args)
+    # Pool worker processes run many jobs; only load each datapackage once
+    mc = MonteCarloLCA(*lca_args, use_cache=True)
     return [next(mc) for x in range(iterations)]
 
 
 def iterative_solving_worker(args):
     lca_args, iterations = args
-    mc = IterativeMonteCarlo(*lca_args)
+    mc = IterativeMonteCarloLCA(*lca_args, use_cache=True)
     return [next(mc) for x in range(iterations)]
 
 
@@ -146,6 +223,8 @@ class ParallelMonteCarlo(object):
     """Split a Monte Carlo calculation into parallel jobs"""
     def __init__(self, demand, data_objs, iterations=1000, chunk_size=None,
                  cpus=None, log_config=None):
+        self.demand = demand
+        self.data_objs = data_objs
         self.cpus = cpus or multiprocessing.cpu_count()
         if chunk_size:
             self.chunk_size = chunk_size
@@ -161,7 +240,7 @@ class ParallelMonteCarlo(object):
             results = pool.map(
                 worker,
                 [
-                    ((demand, data_objs), self.chunk_size)
+                    ((self.demand, self.data_objs), self.chunk_size)
                     for _ in range(self.num_jobs)
                 ]
             )
@@ -0,0 +1,697 @@
+from .errors import NoSolutionFound
+from functools import partial
+from pathlib import Path
+from scipy import sparse
+from scipy.sparse import csgraph, linalg as sparse_linalg
+import inspect
+import json
+import numpy as np
+import os
+import platform
+import scipy.linalg
+import time
+import warnings
+
+try:
+    import pypardiso
+except ImportError:
+    pypardiso = None
+try:
+    import scikits.umfpack as umfpack
+except ImportError:
+    umfpack = None
+
+
+#: Filepath of the cached solver calibration. Can be set with the ``BW_CALC_SOLVER_CALIBRATION`` environment variable.
+CALIBRATION_FILEPATH = Path(os.environ.get(
+    "BW_CALC_SOLVER_CALIBRATION",
+    Path.home() / ".cache" / "bw_calc" / "solver_calibration.json"
+))
+#: Largest matrix size solved with dense LAPACK when choosing a solver without calibration, or larger than the closest calibrated size
+DENSE_MAX_SIZE = 250
+#: Largest matrix size benchmarked with dense LAPACK during calibration
+DENSE_CALIBRATION_MAX_SIZE = 4000
+
+SOLVERS = {}
+
+
+def register_solver(cls):
+    """Add the ``Solver`` subclass ``cls`` to the solver registry, under ``cls.name``. Can be used as a class decorator."""
+    SOLVERS[cls.name] = cls
+    return cls
+
+
+class Solver(object):
+    """Base class for linear system solvers for the technosphere matrix.
+
+    Subclasses implement :meth:`factorize`, and can override :meth:`solve` if they can solve a single system faster than factorizing first. ``format`` is the sparse format the solver works on without conversion; ``LCA`` builds the technosphere matrix in this format.
+
+    ``b`` can be a 1-dimensional array or, if ``multiple_rhs``, a 2-dimensional array with one right-hand side per column. Use :meth:`solve_many` to solve for many right-hand sides with any solver.
+
+    """
+    name = None
+    format = "csc"
+    #: Do the functions returned by :meth:`factorize` accept 2-dimensional ``b``?
+    multiple_rhs = True
+
+    @classmethod
+    def available(cls):
+        """Can this solver be used, i.e. are its libraries installed?"""
+        return True
+
+    def factorize(self, matrix):
+        """Factorize ``matrix``. Returns a function which solves ``matrix x = b`` for ``b``."""
+        raise NotImplementedError
+
+    def solve(self, matrix, b):
+        """Solve ``matrix x = b`` once."""
+        return self.factorize(matrix)(b)
+
+    def solve_many(self, factorization, b):
+        """Solve with ``factorization``, as returned by :meth:`factorize`, for ``b`` with one right-hand side per column. Solves column by column if the solver doesn't accept 2-dimensional ``b``."""
+        b = np.asarray(b)
+        if b.ndim == 2 and not self.multiple_rhs:
+            solution = np.empty(b.shape)
+            for index in range(b.shape[1]):
+                solution[:, index] = np.ravel(factorization(b[:, index]))
+            return solution
+        return factorization(b)
+
+    def prepare(self, matrix):
+        """Convert ``matrix`` to ``self.format`` if needed."""
+        return matrix.asformat(self.format) if sparse.issparse(matrix) else matrix
+
+    def transposed(self, factorization, matrix):
+        """Get a function which solves the transposed system ``matrix.T y = b``, given ``factorization`` of ``matrix``.
+
+        Solvers reuse the factors of ``matrix`` if they can; the default factorizes ``matrix.T``."""
+        return self.factorize(matrix.T)
+
+    def options(self):
+        """Options which change the factorization, as a sorted tuple of ``(name, value)``."""
+        return tuple(sorted(
+            (key, value.tobytes() if isinstance(value, np.ndarray) else value)
+            for key, value in vars(self).items()
+        ))
+
+    def factorization_nbytes(self, factorization, matrix):
+        """Estimate the memory used by ``factorization``, as returned by :meth:`factorize` for ``matrix``.
+
+        The default guesses LU factors with five times the fill of ``matrix``."""
+        return 5 * (matrix.data.nbytes + matrix.indices.nbytes) + matrix.indptr.nbytes
+
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+
+
+@register_solver
+class ScipySolver(Solver):
+    """SciPy's default sparse direct solver: UMFPACK if ``scikits.umfpack`` is installed, otherwise SuperLU."""
+    name = "scipy"
+    # SciPy's UMFPACK solve function only accepts one right-hand side
+    multiple_rhs = umfpack is None
+
+    def factorize(self, matrix):
+        return sparse_linalg.factorized(self.prepare(matrix))
+
+    def solve(self, matrix, b):
+        return sparse_linalg.spsolve(self.prepare(matrix), b)
+
+    def transposed(self, factorization, matrix):
+        if isinstance(getattr(factorization, "__self__", None), sparse_linalg.SuperLU):
+            return superlu_transposed(factorization)
+        return super().transposed(factorization, matrix)
+
+
+@register_solver
+class SuperLUSolver(Solver):
+    """SuperLU sparse LU factorization, via ``scipy.sparse.linalg.splu``.
+
+    Args:
+        * *permc_spec* (str, optional): Column ordering method; see ``splu``.
+        * *column_permutation* (array, optional): Fixed fill-reducing column ordering, e.g. from :meth:`with_ordering`. Factorizing then skips the ordering step, and only does the numeric factorization of the permuted matrix.
+
+    """
+    name = "superlu"
+
+    def __init__(self, permc_spec=None, column_permutation=None):
+        self.permc_spec = permc_spec
+        self.column_permutation = column_permutation
+
+    @classmethod
+    def with_ordering(cls, matrix, permc_spec="COLAMD"):
+        """Compute the column ordering of ``matrix`` once, and return a solver which reuses it for all matrices with the same sparsity pattern."""
+        lu = sparse_linalg.splu(sparse.csc_matrix(matrix), permc_spec=permc_spec)
+        # SuperLU factorizes ``Pr A Pc``; the column order for ``matrix[:, permutation]`` is the inverse of ``perm_c``
+        return cls(column_permutation=np.argsort(lu.perm_c))
+
+    def factorize(self, matrix):
+        matrix = self.prepare(matrix)
+        if self.column_permutation is not None:
+            lu = sparse_linalg.splu(matrix[:, self.column_permutation], permc_spec="NATURAL")
+            return PermutedLU(lu, self.column_permutation).solve
+        kwargs = {"permc_spec": self.permc_spec} if self.permc_spec else {}
+        return sparse_linalg.splu(matrix, **kwargs).solve
+
+    def solve(self, matrix, b):
+        if self.column_permutation is not None:
+            return self.factorize(matrix)(b)
+        return sparse_linalg.spsolve(
+            self.prepare(matrix), b, permc_spec=self.permc_spec, use_umfpack=False
+        )
+
+    def transposed(self, factorization, matrix):
+        return superlu_transposed(factorization)
+
+    def factorization_nbytes(self, factorization, matrix):
+        lu = factorization.__self__
+        lu = getattr(lu, "lu", lu)
+        return sum(
+            m.data.nbytes + m.indices.nbytes + m.indptr.nbytes for m in (lu.L, lu.U)
+        ) + lu.perm_r.nbytes + lu.perm_c.nbytes
+
+
+class PermutedLU(object):
+    """SuperLU factorization ``lu`` of ``matrix[:, permutation]``, used to solve systems with ``matrix``."""
+    def __init__(self, lu, permutation):
+        self.lu = lu
+        self.permutation = permutation
+
+    def solve(self, b, trans="N"):
+        if trans == "N":
+            permuted = self.lu.solve(b)
+            solution = np.empty_like(permuted)
+            solution[self.permutation] = permuted
+            return solution
+        return self.lu.solve(np.asarray(b)[self.permutation], trans=trans)
+
+
+@register_solver
+class UMFPACKSolver(Solver):
+    """UMFPACK sparse LU factorization. Needs ``scikits.umfpack``."""
+    name = "umfpack"
+    multiple_rhs = False
+
+    @classmethod
+    def available(cls):
+        return umfpack is not None
+
+    def factorize(self, matrix):
+        lu = umfpack.splu(self.prepare(matrix))
+        return lu.solve
+
+
+@register_solver
+class PardisoSolver(Solver):
+    """Intel MKL PARDISO, via ``pypardiso``. Usually the fastest solver for large matrices."""
+    name = "pypardiso"
+    format = "csr"
+
+    @classmethod
+    def available(cls):
+        return pypardiso is not None
+
+    def factorize(self, matrix):
+        return pypardiso.factorized(self.prepare(matrix))
+
+    def solve(self, matrix, b):
+        return pypardiso.spsolve(self.prepare(matrix), b)
+
+
+@register_solver
+class DenseSolver(Solver):
+    """Dense LU factorization with LAPACK. Fastest for small matrices, e.g. foreground models."""
+    name = "dense"
+
+    def factorize(self, matrix):
+        return partial(scipy.linalg.lu_solve, scipy.linalg.lu_factor(self.to_dense(matrix)))
+
+    def transposed(self, factorization, matrix):
+        return partial(scipy.linalg.lu_solve, factorization.args[0], trans=1)
+
+    def solve(self, matrix, b):
+        return np.linalg.solve(self.to_dense(matrix), b)
+
+    def to_dense(self, matrix):
+        return matrix.toarray() if sparse.issparse(matrix) else np.asarray(matrix)
+
+    def factorization_nbytes(self, factorization, matrix):
+        return matrix.shape[0] * matrix.shape[1] * 8
+
+
+@register_solver
+class KrylovSolver(Solver):
+    """Iterative Krylov solver (GMRES, BiCGSTAB or CGS) with an incomplete LU (ILU) preconditioner.
+
+    Needs less memory than a full factorization. If the iterative solver doesn't converge, a ``NoSolutionFound`` warning is given and the system is solved with SuperLU instead.
+
+    Args:
+        * *method* (str): ``"gmres"`` (default), ``"bicgstab"`` or ``"cgs"``.
+        * *tol* (float): Relative tolerance of the residual.
+        * *maxiter* (int): Maximum number of iterations.
+        * *drop_tol* (float): Drop tolerance of the ILU preconditioner.
+        * *fill_factor* (float): Fill factor of the ILU preconditioner.
+
+    """
+    name = "krylov"
+    methods = ("gmres", "bicgstab", "cgs")
+
+    def __init__(self, method="gmres", tol=1e-10, maxiter=1000, drop_tol=1e-4, fill_factor=10):
+        if method not in self.methods:
+            raise ValueError(f"Unknown Krylov method: '{method}'")
+        self.method = method
+        self.tol = tol
+        self.maxiter = maxiter
+        self.drop_tol = drop_tol
+        self.fill_factor = fill_factor
+
+    def preconditioner(self, matrix):
+        """Build an ILU preconditioner for ``matrix`` as a ``LinearOperator``."""
+        ilu = sparse_linalg.spilu(
+            self.prepare(matrix), drop_tol=self.drop_tol, fill_factor=self.fill_factor
+        )
+        return sparse_linalg.LinearOperator(matrix.shape, ilu.solve)
+
+    def iterate(self, matrix, b, preconditioner=None, x0=None):
+        """Run the Krylov method once. Returns ``(solution, info)``, with ``info`` as in SciPy."""
+        method = getattr(sparse_linalg, self.method)
+        return method(
+            matrix, b, x0=x0, M=preconditioner, maxiter=self.maxiter,
+            **tolerance_kwargs(method, self.tol)
+        )
+
+    def factorize(self, matrix):
+        matrix = self.prepare(matrix)
+        preconditioner = self.preconditioner(matrix)
+
+        def solve(b):
+            if np.ndim(b) == 2:
+                return np.column_stack([solve(column) for column in b.T])
+            solution, info = self.iterate(matrix, b, preconditioner)
+            if info != 0:
+                warnings.warn(
+                    f"{self.method} didn't converge (info {info}); using SuperLU",
+                    NoSolutionFound
+                )
+                return SuperLUSolver().solve(matrix, b)
+            return solution
+
+        return solve
+
+
+class BlockTriangularDecomposition(object):
+    """Strongly connected components of a square matrix's graph, grouped into levels which can be solved in order.
+
+    Row ``i`` depends on column ``j`` if ``matrix[i, j]`` is stored. Components at the same level only depend on components at lower levels, so permuting the matrix by level gives a block upper triangular form. Only depends on the sparsity pattern of ``matrix``.
+
+    Attributes:
+        * *levels* (list): ``(rows, trivial, blocks)`` for each level, where ``rows`` are the matrix rows in the level, ``trivial`` are positions in ``rows`` of components with one row, and ``blocks`` are the rows of each larger component.
+        * *n_components* (int): Number of strongly connected components.
+        * *largest_block* (int): Size of the largest component.
+
+    """
+    def __init__(self, matrix):
+        matrix = sparse.csr_matrix(matrix)
+        self.indptr, self.indices = matrix.indptr, matrix.indices
+        self.n_components, labels = csgraph.connected_components(
+            matrix, directed=True, connection="strong"
+        )
+        sizes = np.bincount(labels, minlength=self.n_components)
+        self.largest_block = int(sizes.max()) if len(sizes) else 0
+
+        # Condensed graph: component of row ``i`` depends on component of column ``j``
+        coo = matrix.tocoo()
+        depends, on = labels[coo.row], labels[coo.col]
+        external = depends != on
+        condensed = sparse.csr_matrix(
+            (np.ones(external.sum(), dtype=np.int8), (depends[external], on[external])),
+            shape=(self.n_components, self.n_components)
+        )
+        condensed.sum_duplicates()
+        dependents = condensed.T.tocsr()
+        remaining = np.diff(condensed.indptr)
+
+        component_levels = np.zeros(self.n_components, dtype=np.int64)
+        frontier = np.flatnonzero(remaining == 0)
+        level = 0
+        while len(frontier):
+            component_levels[frontier] = level
+            released = dependents[frontier].indices
+            np.subtract.at(remaining, released, 1)
+            frontier = np.unique(released[remaining[released] == 0])
+            level += 1
+
+        row_levels = component_levels[labels]
+        order = np.argsort(row_levels, kind="stable")
+        bounds = np.searchsorted(row_levels[order], np.arange(level + 1))
+        self.levels = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            rows = order[start:end]
+            row_labels = labels[rows]
+            trivial = np.flatnonzero(sizes[row_labels] == 1)
+            block_labels = np.unique(row_labels[sizes[row_labels] > 1])
+            blocks = [rows[row_labels == label] for label in block_labels]
+            self.levels.append((rows, trivial, blocks))
+
+    def matches(self, matrix):
+        """Does ``matrix`` (in CSR format) have the sparsity pattern this decomposition was built from?"""
+        if matrix.indices is self.indices and matrix.indptr is self.indptr:
+            return True
+        return (
+            np.array_equal(matrix.indptr, self.indptr)
+            and np.array_equal(matrix.indices, self.indices)
+        )
+
+
+@register_solver
+class BlockTriangularSolver(Solver):
+    """Solve by permuting the matrix to block upper triangular form, following its strongly connected components.
+
+    Technosphere matrices are mostly acyclic, so most components are single activities, which are solved by substitution. Only the diagonal blocks of larger components are factorized, with ``block_solver``. Components are solved level by level, so all components at one level are handled with vectorized operations.
+
+    The decomposition (see :class:`BlockTriangularDecomposition`) only depends on the sparsity pattern, and is kept in ``self.decomposition`` and reused while the pattern doesn't change, e.g. in ``redo_lci`` and Monte Carlo iterations.
+
+    Args:
+        * *block_solver* (str): Registered solver name for the diagonal blocks of larger components. Default is ``superlu``.
+
+    """
+    name = "block_triangular"
+    format = "csr"
+
+    def __init__(self, block_solver="superlu"):
+        self.block_solver = block_solver
+        self.decomposition = None
+
+    def options(self):
+        return (("block_solver", self.block_solver),)
+
+    def decompose(self, matrix):
+        """Get the decomposition for ``matrix``, reusing ``self.decomposition`` if the sparsity pattern is the same."""
+        if self.decomposition is None or not self.decomposition.matches(matrix):
+            self.decomposition = BlockTriangularDecomposition(matrix)
+        return self.decomposition
+
+    def factorize(self, matrix):
+        matrix = self.prepare(matrix)
+        block_solver = get_solver(self.block_solver)
+        diagonal = matrix.diagonal()
+        steps = []
+        for rows, trivial, blocks in self.decompose(matrix).levels:
+            # Rows in a level and in each block are sorted
+            block_factorizations = [
+                (np.searchsorted(rows, block), block_solver.factorize(matrix[block][:, block]))
+                for block in blocks
+            ]
+            steps.append((rows, matrix[rows], trivial, diagonal[rows[trivial]], block_factorizations))
+        return self.level_solver(steps)
+
+    def transposed(self, factorization, matrix):
+        """Solve the transposed system level by level in reverse order, reusing the decomposition and the factorizations of the diagonal blocks."""
+        steps = getattr(factorization, "steps", None)
+        if steps is None:
+            steps = self.factorize(matrix).steps
+        matrix = self.prepare(matrix)
+        transposed = matrix.T.tocsr()
+        block_solver = get_solver(self.block_solver)
+        return self.level_solver([
+            (rows, transposed[rows], trivial, pivots, [
+                (positions, block_solver.transposed(
+                    block_factorization, matrix[rows[positions]][:, rows[positions]]
+                ))
+                for positions, block_factorization in block_factorizations
+            ])
+            for rows, _, trivial, pivots, block_factorizations in reversed(steps)
+        ])
+
+    @staticmethod
+    def level_solver(steps):
+        """Get a function which solves with ``steps``, a list of ``(rows, level_matrix, trivial, pivots, block_factorizations)`` in the order the levels are solved. ``steps`` is kept as the ``steps`` attribute of the function."""
+        def solve(b):
+            b = np.asarray(b, dtype=np.float64)
+            solution = np.zeros(b.shape)
+            for rows, level_matrix, trivial, pivots, block_factorizations in steps:
+                residual = b[rows] - level_matrix @ solution
+                values = np.empty(residual.shape)
+                values[trivial] = residual[trivial] / (pivots[:, None] if b.ndim == 2 else pivots)
+                for positions, factorization in block_factorizations:
+                    values[positions] = np.reshape(factorization(residual[positions]), values[positions].shape)
+                solution[rows] = values
+            return solution
+
+        solve.steps = steps
+        return solve
+
+
+class SchurComplementSolver(Solver):
+    """Solve with a fixed background and a small foreground, through the Schur complement of the background block.
+
+    With rows and columns split into foreground (``f``) and background (``b``), the system is
+
+    .. math::
+
+        \\begin{bmatrix} A_{ff} & A_{fb} \\\\ A_{bf} & A_{bb} \\end{bmatrix} \\begin{bmatrix} x_f \\\\ x_b \\end{bmatrix} = \\begin{bmatrix} d_f \\\\ d_b \\end{bmatrix}
+
+    The background block :math:`A_{bb}` is factorized with ``background_solver``, and the coupling term :math:`G = A_{bb}^{-1}E`, where :math:`E` selects the background rows used in :math:`A_{bf}`, is computed once. Both are reused for all later matrices with the same background values, so a new foreground only needs the small, dense Schur complement :math:`S = A_{ff} - A_{fb}GV`, with :math:`V` the nonzero rows of :math:`A_{bf}`, and:
+
+    .. math::
+
+        x_f = S^{-1}(d_f - A_{fb}A_{bb}^{-1}d_b), \\quad x_b = A_{bb}^{-1}d_b - GVx_f
+
+    :math:`G` is dense, with one column per background product used by the foreground. Not registered, as it needs the foreground partition; use the ``foreground`` argument of ``LCA``.
+
+    Args:
+        * *foreground_rows* (array): Row indices of foreground products.
+        * *foreground_cols* (array): Column indices of foreground activities. Must have the same length as ``foreground_rows``.
+        * *background_solver* (str or ``Solver``, optional): Solver for the background block. Default is :func:`default_solver_name`.
+
+    """
+    name = "schur"
+    format = "csr"
+
+    def __init__(self, foreground_rows, foreground_cols, background_solver=None):
+        self.foreground_rows = np.asarray(foreground_rows, dtype=np.int64)
+        self.foreground_cols = np.asarray(foreground_cols, dtype=np.int64)
+        if len(self.foreground_rows) != len(self.foreground_cols):
+            raise ValueError("Foreground must have the same number of products and activities")
+        self.background_solver = get_solver(background_solver)
+        self.background = None
+
+    def options(self):
+        return (
+            ("foreground_rows", self.foreground_rows.tobytes()),
+            ("foreground_cols", self.foreground_cols.tobytes()),
+            ("background_solver", self.background_solver.__class__.__name__, self.background_solver.options()),
+        )
+
+    def partition(self, size, foreground):
+        background = np.ones(size, dtype=bool)
+        background[foreground] = False
+        return np.flatnonzero(background)
+
+    def factorize_background(self, background_matrix, coupling_rows):
+        """Factorize ``background_matrix`` and compute ``G``, reusing ``self.background`` if the background values and coupling rows are unchanged."""
+        cached = self.background
+        if (
+            cached is not None
+            and cached["matrix"].shape == background_matrix.shape
+            and np.array_equal(cached["matrix"].indptr, background_matrix.indptr)
+            and np.array_equal(cached["matrix"].indices, background_matrix.indices)
+            and np.array_equal(cached["matrix"].data, background_matrix.data)
+            and np.array_equal(cached["coupling_rows"], coupling_rows)
+        ):
+            return cached
+        solve = self.background_solver.factorize(self.background_solver.prepare(background_matrix))
+        selection = np.zeros((background_matrix.shape[0], len(coupling_rows)))
+        selection[coupling_rows, np.arange(len(coupling_rows))] = 1
+        coupling = np.reshape(
+            self.background_solver.solve_many(solve, selection), selection.shape
+        ) if len(coupling_rows) else selection
+        self.background = {
+            "matrix": background_matrix.copy(),
+            "coupling_rows": coupling_rows,
+            "solve": solve,
+            "coupling": coupling,
+        }
+        return self.background
+
+    def factorize(self, matrix):
+        matrix = self.prepare(matrix)
+        fr, fc = self.foreground_rows, self.foreground_cols
+        br, bc = self.partition(matrix.shape[0], fr), self.partition(matrix.shape[1], fc)
+        rows_f, rows_b = matrix[fr], matrix[br]
+        A_ff, A_fb = rows_f[:, fc].toarray(), rows_f[:, bc].tocsr()
+        A_bf = rows_b[:, fc].tocsr()
+
+        coupling_rows = np.flatnonzero(np.diff(A_bf.indptr))
+        background = self.factorize_background(rows_b[:, bc].tocsr(), coupling_rows)
+        V = A_bf[coupling_rows].toarray()
+        G = background["coupling"]
+        schur = scipy.linalg.lu_factor(A_ff - (A_fb @ G) @ V)
+        solve_background = background["solve"]
+
+        def solve(b):
+            b = np.asarray(b, dtype=np.float64)
+            b_b = b[br]
+            if b_b.any():
+                y_b = np.reshape(self.background_solver.solve_many(solve_background, b_b), b_b.shape)
+            else:
+                y_b = np.zeros(b_b.shape)
+            x_f = scipy.linalg.lu_solve(schur, b[fr] - A_fb @ y_b)
+            solution = np.empty(b.shape)
+            solution[fc] = x_f
+            solution[bc] = y_b - G @ (V @ x_f)
+            return solution
+
+        return solve
+
+    def transposed(self, factorization, matrix):
+        solver = SchurComplementSolver(
+            self.foreground_cols, self.foreground_rows, self.background_solver
+        )
+        return solver.factorize(matrix.T)
+
+    def factorization_nbytes(self, factorization, matrix):
+        coupling = self.background["coupling"].nbytes if self.background else 0
+        return coupling + super().factorization_nbytes(factorization, matrix)
+
+
+def superlu_transposed(factorization):
+    """Solve the transposed system with the factors of a ``SuperLU`` object, given its bound ``solve`` method."""
+    return partial(factorization.__self__.solve, trans="T")
+
+
+def tolerance_kwargs(method, tol):
+    """Relative tolerance argument for SciPy Krylov ``method``, which was renamed from ``tol`` to ``rtol``."""
+    parameters = inspect.signature(method).parameters
+    kwargs = {"rtol": tol} if "rtol" in parameters else {"tol": tol}
+    if "atol" in parameters:
+        kwargs["atol"] = 0.
+    return kwargs
+
+
+def available_solvers():
+    """Names of the registered solvers which can be used."""
+    return [name for name, cls in SOLVERS.items() if cls.available()]
+
+
+def default_solver_name():
+    """Name of the default solver: ``pypardiso`` if installed, otherwise SciPy's default."""
+    return "pypardiso" if PardisoSolver.available() else "scipy"
+
+
+def get_solver(solver=None, **kwargs):
+    """Get a ``Solver`` instance.
+
+    ``solver`` can be a ``Solver`` instance (returned as is), a registered solver name, or ``None`` for :func:`default_solver_name`. ``kwargs`` are passed to the solver class. Use :func:`select_solver` for ``"auto"``."""
+    if isinstance(solver, Solver):
+        return solver
+    name = solver or default_solver_name()
+    try:
+        cls = SOLVERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown solver '{name}'; registered solvers are {sorted(SOLVERS)}")
+    if not cls.available():
+        raise ValueError(f"Solver '{name}' is not available; required libraries are not installed")
+    return cls(**kwargs)
+
+
+def select_solver(matrix, calibration=None):
+    """Choose a solver for ``matrix`` automatically.
+
+    Dense matrices (more than 10% nonzero) use dense LAPACK. Otherwise, if a calibration is available (given, or cached at ``CALIBRATION_FILEPATH`` by :func:`calibrate` on this machine), use the fastest available solver for the calibrated matrix size closest to the size of ``matrix``. Calibration matrices are sparse, and dense LAPACK scales with the cube of the size, so its timing is only used for matrices no larger than the calibrated size, or up to ``DENSE_MAX_SIZE``. Without a calibration, use dense LAPACK for small matrices, and the first available of PARDISO, UMFPACK and SuperLU otherwise."""
+    size = matrix.shape[0]
+    density = matrix.nnz / max(size * size, 1) if sparse.issparse(matrix) else 1.
+    if density > 0.1:
+        return get_solver("dense")
+    calibration = calibration or load_calibration()
+    available = set(available_solvers())
+
+    if calibration and calibration.get("timings"):
+        calibrated_size = min(
+            (int(x) for x in calibration["timings"]),
+            key=lambda x: abs(np.log(x) - np.log(max(size, 1)))
+        )
+        timings = {
+            name: seconds
+            for name, seconds in calibration["timings"][str(calibrated_size)].items()
+            if name in available
+        }
+        if size > max(calibrated_size, DENSE_MAX_SIZE):
+            timings.pop("dense", None)
+        if timings:
+            return get_solver(min(timings, key=timings.get))
+
+    if size <= DENSE_MAX_SIZE:
+        return get_solver("dense")
+    for name in ("pypardiso", "umfpack", "superlu"):
+        if name in available:
+            return get_solver(name)
+
+
+def benchmark_matrix(size, seed=42, per_column=6):
+    """Build a random, nonsingular technosphere-like CSC matrix: unit diagonal, and about ``per_column`` small negative inputs per column."""
+    rng = np.random.RandomState(seed)
+    count = size * per_column
+    rows = rng.randint(0, size, count)
+    cols = rng.randint(0, size, count)
+    off_diagonal = rows != cols
+    diagonal = np.arange(size)
+    values = np.hstack([-rng.uniform(0, 1. / per_column, count)[off_diagonal], np.ones(size)])
+    rows = np.hstack([rows[off_diagonal], diagonal])
+    cols = np.hstack([cols[off_diagonal], diagonal])
+    return sparse.coo_matrix((values, (rows, cols)), (size, size)).tocsc()
+
+
+def calibrate(sizes=(20, 200, 2000, 20000), repeats=3, filepath=None, solvers=None):
+    """Time factorizing and solving benchmark matrices with each available solver, and cache the results for :func:`select_solver`.
+
+    Args:
+        * *sizes* (iterable): Matrix sizes to benchmark.
+        * *repeats* (int): Number of timings per solver and size; the fastest is kept.
+        * *filepath* (str or ``Path``, optional): Where to save results. Default is ``CALIBRATION_FILEPATH``.
+        * *solvers* (iterable, optional): Solver names to benchmark. Default is all available solvers.
+
+    Returns the calibration ``dict``."""
+    timings = {}
+    for size in sizes:
+        matrix = benchmark_matrix(size)
+        b = np.ones(size)
+        timings[str(size)] = {}
+        for name in (solvers or available_solvers()):
+            if name == "dense" and size > DENSE_CALIBRATION_MAX_SIZE:
+                continue
+            solver = get_solver(name)
+            prepared = solver.prepare(matrix)
+            best = np.inf
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    solver.factorize(prepared)(b)
+                    best = min(best, time.perf_counter() - start)
+            timings[str(size)][name] = best
+
+    calibration = {"machine": machine_id(), "timings": timings}
+    filepath = Path(filepath or CALIBRATION_FILEPATH)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, "w") as f:
+        json.dump(calibration, f, indent=2)
+    return calibration
+
+
+def load_calibration(filepath=None):
+    """Load a cached calibration, if one was made on this machine. Returns ``None`` otherwise."""
+    filepath = Path(filepath or CALIBRATION_FILEPATH)
+    try:
+        with open(filepath) as f:
+            calibration = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if calibration.get("machine") != machine_id() or not calibration.get("timings"):
+        return None
+    return calibration
+
+
+def machine_id():
+    """Identify this machine, as home directories with calibration files can be shared between machines."""
+    return "{}|{}|{}".format(platform.node(), platform.machine(), os.cpu_count())
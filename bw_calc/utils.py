@@ -1,56 +1,248 @@
 from .errors import NoArrays
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib import format as npy_format
 from pathlib import Path
 import hashlib
 import numpy as np
+import struct
 import zipfile
 import json
 
 MAX_SIGNED_32BIT_INT = 2147483647
 
+UNCERTAINTY_FIELDS = (
+    "uncertainty_type",
+    "amount",
+    "loc",
+    "scale",
+    "shape",
+    "minimum",
+    "maximum",
+    "negative",
+)
 
-def load_data_obj(data_obj, check_integrity=True):
-    """Load a data obj, provided as either a filepath, a directory path, or a dict."""
-    result = {}
-    if isinstance(data_obj, dict):
+
+def load_data_obj(data_obj, check_integrity=True, mmap_mode=None, lazy=False, max_workers=None):
+    """Load a data obj, provided as either a filepath, a directory path, or a dict.
+
+    ``mmap_mode`` is passed to ``np.load`` for the resources of directory datapackages. Use ``"r"`` to open them as read-only memory maps, which are shared through the OS page cache instead of being copied into each process. Uncompressed members of zipped datapackages are memory-mapped directly from the archive; other zipped members are always loaded into memory. Ignored for in-memory datapackages.
+
+    If ``lazy``, return a :class:`LazyDatapackage` which only loads resources when they are first needed.
+
+    If ``max_workers`` is given, resources are loaded concurrently in that many threads. Reading and decompressing arrays mostly releases the GIL."""
+    if isinstance(data_obj, Mapping):
         return data_obj
     elif isinstance(data_obj, (str, Path)):
-        if Path(data_obj).is_file() and str(data_obj).endswith(".zip"):
-            zf = zipfile.ZipFile(data_obj)
-            assert "datapackage.json" in zf.namelist(), "Missing datapackage"
-            result = {'datapackage': json.load(zf.open("datapackage.json"))}
-            for resource in result['datapackage']['resources']:
-                result[resource['path']] = np.load(zf.open(resource['path']), allow_pickle=False)
-            return result
-        elif Path(data_obj).is_dir():
-            dp = Path(data_obj)
-            assert (dp / "datapackage.json").is_file(), "Missing datapackage"
-            result = {'datapackage': json.load(open(dp / "datapackage.json"))}
-            for resource in result['datapackage']['resources']:
-                result[resource['path']] = np.load(dp / resource['path'], allow_pickle=False)
-            return result
+        if (Path(data_obj).is_file() and str(data_obj).endswith(".zip")) \
+                or Path(data_obj).is_dir():
+            dp = LazyDatapackage(data_obj, mmap_mode=mmap_mode)
+            if lazy:
+                return dp
+            dp.prefetch(max_workers=max_workers)
+            return dict(dp)
     raise ValueError(f"Can't understand data_obj: '{data_obj}'")
 
 
-def filter_data_for_matrix(data_objs, matrix_label):
-    """Load and concatenate arrays for a given matrix"""
-    arrays = [
-        load_array(data_obj[resource["path"]])
-        for data_obj in data_objs
-        for resource in data_obj["datapackage"]["resources"]
-        if resource["matrix"] == matrix_label
-    ]
+class LazyDatapackage(Mapping):
+    """A datapackage whose resources are loaded on first access.
+
+    Behaves like the dictionary returned by :func:`load_data_obj`, but only ``datapackage.json`` is read on creation. Each resource array is loaded the first time it is requested, e.g. by :func:`filter_data_for_matrix` for its matrix, and then kept.
+
+    Args:
+        * *path* (str or ``Path``): Filepath of a zipped datapackage, or path of a datapackage directory.
+        * *mmap_mode* (str, optional): Passed to ``np.load`` for directory resources.
+
+    """
+    def __init__(self, path, mmap_mode=None):
+        self.path = Path(path)
+        self.mmap_mode = mmap_mode
+        self.zipped = self.path.is_file() and str(self.path).endswith(".zip")
+        if self.zipped:
+            with zipfile.ZipFile(self.path) as zf:
+                assert "datapackage.json" in zf.namelist(), "Missing datapackage"
+                self.datapackage = json.load(zf.open("datapackage.json"))
+        elif self.path.is_dir():
+            assert (self.path / "datapackage.json").is_file(), "Missing datapackage"
+            with open(self.path / "datapackage.json") as f:
+                self.datapackage = json.load(f)
+        else:
+            raise ValueError(f"Can't understand data_obj: '{path}'")
+        self.resource_paths = [
+            resource['path'] for resource in self.datapackage['resources']
+        ]
+        self.loaded = {}
+
+    def __getitem__(self, key):
+        if key == "datapackage":
+            return self.datapackage
+        if key not in self.loaded:
+            if key not in self.resource_paths:
+                raise KeyError(key)
+            self.loaded[key] = self.load_resource(key)
+        return self.loaded[key]
+
+    def __iter__(self):
+        yield "datapackage"
+        yield from self.resource_paths
+
+    def __len__(self):
+        return len(self.resource_paths) + 1
+
+    def prefetch(self, resource_paths=None, max_workers=None):
+        """Load the resources ``resource_paths`` (default is all resources) which aren't loaded yet.
+
+        Uses a pool of ``max_workers`` threads if given."""
+        missing = [
+            path for path in (resource_paths or self.resource_paths)
+            if path not in self.loaded
+        ]
+        for path, array in zip(missing, map_in_threads(self.load_resource, missing, max_workers)):
+            self.loaded[path] = array
+
+    def load_resource(self, resource_path):
+        """Load the array for ``resource_path`` from disk."""
+        if self.zipped:
+            with zipfile.ZipFile(self.path) as zf:
+                return load_zipped_array(zf, resource_path, mmap_mode=self.mmap_mode)
+        else:
+            return np.load(
+                self.path / resource_path, mmap_mode=self.mmap_mode, allow_pickle=False
+            )
+
+
+def read_npy_header(fo):
+    """Read the header of a ``.npy`` file from the file object ``fo``.
+
+    Returns ``(shape, fortran_order, dtype)``, or ``None`` if the format version isn't supported. ``fo`` is left at the start of the array data."""
+    version = npy_format.read_magic(fo)
+    if version == (1, 0):
+        return npy_format.read_array_header_1_0(fo)
+    elif version == (2, 0):
+        return npy_format.read_array_header_2_0(fo)
+
+
+def zip_member_data_offset(zf, info):
+    """Get the byte offset of the data of the member ``info`` in the archive file of ``zf``.
+
+    The local file header can have a different extra field than the central directory, so its field lengths are read from the archive."""
+    zf.fp.seek(info.header_offset)
+    header = zf.fp.read(zipfile.sizeFileHeader)
+    if header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Bad local file header for '{info.filename}'")
+    filename_length, extra_length = struct.unpack("<HH", header[26:30])
+    return info.header_offset + zipfile.sizeFileHeader + filename_length + extra_length
+
+
+def load_zipped_array(zf, name, mmap_mode=None):
+    """Load the ``.npy`` member ``name`` from the open ``ZipFile`` ``zf``.
+
+    Uncompressed (``ZIP_STORED``) members are memory-mapped straight from the archive if ``mmap_mode`` is given. Memory maps into an archive are always read-only (or copy-on-write for ``mmap_mode="c"``).
+
+    Compressed members are decompressed directly into the output array, without intermediate buffers."""
+    info = zf.getinfo(name)
+    if info.flag_bits & 0x1:
+        # Encrypted; let ``zipfile`` deal with it
+        return np.load(zf.open(name), allow_pickle=False)
+
+    if mmap_mode and info.compress_type == zipfile.ZIP_STORED and zf.filename:
+        offset = zip_member_data_offset(zf, info)
+        with open(zf.filename, "rb") as f:
+            f.seek(offset)
+            header = read_npy_header(f)
+            if header is not None:
+                shape, fortran_order, dtype = header
+                if not dtype.hasobject:
+                    return np.memmap(
+                        zf.filename,
+                        dtype=dtype,
+                        mode="c" if mmap_mode == "c" else "r",
+                        offset=f.tell(),
+                        shape=shape,
+                        order="F" if fortran_order else "C",
+                    )
+
+    with zf.open(name) as fo:
+        header = read_npy_header(fo)
+        if header is None:
+            return np.load(zf.open(name), allow_pickle=False)
+        shape, fortran_order, dtype = header
+        if dtype.hasobject:
+            raise ValueError("Object arrays cannot be loaded when allow_pickle=False")
+        array = np.empty(shape[::-1] if fortran_order else shape, dtype=dtype)
+        buffer = memoryview(array.reshape(-1).view(np.uint8))
+        position = 0
+        while position < array.nbytes:
+            count = fo.readinto(buffer[position:])
+            if not count:
+                raise ValueError(f"Truncated array data in '{name}'")
+            position += count
+    return array.transpose() if fortran_order else array
+
+
+def map_in_threads(func, iterable, max_workers=None):
+    """Return ``list(map(func, iterable))``, using a pool of ``max_workers`` threads if given.
+
+    Results are in the same order as ``iterable``."""
+    iterable = list(iterable)
+    if not max_workers or len(iterable) < 2:
+        return [func(obj) for obj in iterable]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, iterable))
+
+
+def filter_data_for_matrix(data_objs, matrix_label, max_workers=None, fields=None):
+    """Load and concatenate arrays for a given matrix.
+
+    Each resource array is copied once, directly into a preallocated result array; see :func:`concatenate_arrays`. If ``fields`` is given, only these fields are kept. A single read-only resource, e.g. a memory map, is returned as is if ``fields`` is not given.
+
+    If ``max_workers`` is given, resources not yet loaded (see :class:`LazyDatapackage`) are loaded concurrently in that many threads. The result is the same as loading them one at a time."""
+    arrays = map_in_threads(
+        lambda args: load_array(args[0][args[1]], copy=False),
+        [
+            (data_obj, resource["path"])
+            for data_obj in data_objs
+            for resource in data_obj["datapackage"]["resources"]
+            if resource["matrix"] == matrix_label
+        ],
+        max_workers
+    )
     if not arrays:
         raise NoArrays(f"No arrays for '{matrix_label}'")
-    return np.hstack(arrays)
+    elif len(arrays) == 1 and fields is None and not arrays[0].flags.writeable:
+        return arrays[0]
+    return concatenate_arrays(arrays, fields)
+
+
+def concatenate_arrays(arrays, fields=None):
+    """Concatenate structured ``arrays`` into a new array, copying each input array only once.
+
+    The total length is measured first, and each input is written into its slice of the preallocated result. The result has the dtype of the first array, restricted to ``fields`` if given. Fields are matched by name."""
+    dtype = arrays[0].dtype
+    if fields is not None:
+        dtype = np.dtype([(field, dtype.fields[field][0]) for field in fields])
+    result = np.empty(sum(len(array) for array in arrays), dtype=dtype)
+    start = 0
+    for array in arrays:
+        end = start + len(array)
+        if array.dtype == dtype:
+            result[start:end] = array
+        else:
+            for field in dtype.names:
+                result[field][start:end] = array[field]
+        start = end
+    return result
 
 
-def load_array(obj):
+def load_array(obj, copy=True):
     """Load the numpy array if necessary.
 
     Currently accepts ``str`` filepaths, ``BytesIO``,
-     ``numpy.ndarray`` arrays. Creates copies of objects"""
+     ``numpy.ndarray`` arrays. If ``copy``, creates copies of writeable arrays; read-only arrays (e.g. memory maps) can't be modified, and are returned as is."""
     if isinstance(obj, np.ndarray):
         # we're done here as the object is already a numpy array
+        if not copy or not obj.flags.writeable:
+            return obj
         return obj.copy()
     else:
         # treat object as loadable by numpy and try to load it from disk
@@ -59,17 +251,7 @@ def load_array(obj):
 
 def extract_uncertainty_fields(array):
     """Extract the core set of fields needed for uncertainty analysis from a parameter array"""
-    fields = [
-        "uncertainty_type",
-        "amount",
-        "loc",
-        "scale",
-        "shape",
-        "minimum",
-        "maximum",
-        "negative",
-    ]
-    return array[fields].copy()
+    return array[list(UNCERTAINTY_FIELDS)].copy()
 
 
 def get_seed(seed=None):
@@ -0,0 +1,209 @@
+from bw_calc import LCA, MonteCarloLCA
+from bw_calc.caching import (
+    DatapackageCache,
+    FactorizationCache,
+    MatrixCache,
+    data_obj_nbytes,
+    factorization_cache,
+    matrix_hash,
+)
+from bw_calc.solvers import SuperLUSolver, benchmark_matrix
+from bw_calc.utils import load_data_obj
+from pathlib import Path
+import numpy as np
+import os
+import shutil
+
+fixtures_dir = Path(__file__, "..").resolve() / "fixtures"
+
+
+def copy_directory_fixture(tmp_path):
+    return Path(shutil.copytree(fixtures_dir / "basic-cp-directory", tmp_path / "dp"))
+
+
+def test_cache_hit_returns_same_object(tmp_path):
+    cache = DatapackageCache()
+    fp = copy_directory_fixture(tmp_path)
+    first = cache.load(fp)
+    assert cache.load(str(fp)) is first
+    assert len(cache.entries) == 1
+
+
+def test_cache_separate_entries_for_load_options(tmp_path):
+    cache = DatapackageCache()
+    fp = copy_directory_fixture(tmp_path)
+    assert cache.load(fp) is not cache.load(fp, mmap_mode="r")
+    assert len(cache.entries) == 2
+
+
+def test_cache_modified_file_loaded_again(tmp_path):
+    cache = DatapackageCache()
+    fp = copy_directory_fixture(tmp_path)
+    first = cache.load(fp)
+    stat = (fp / "basic-biosphere.npy").stat()
+    os.utime(fp / "basic-biosphere.npy", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = cache.load(fp)
+    assert second is not first
+    assert len(cache.entries) == 1
+
+
+def test_cache_content_hash(tmp_path):
+    cache = DatapackageCache(use_hash=True)
+    fp = copy_directory_fixture(tmp_path)
+    first = cache.load(fp)
+    stat = (fp / "basic-biosphere.npy").stat()
+    os.utime(fp / "basic-biosphere.npy", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.load(fp) is first
+
+
+def test_cache_eviction(tmp_path):
+    fp = copy_directory_fixture(tmp_path)
+    zipped = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    cache = DatapackageCache()
+    size = data_obj_nbytes(cache.load(fp))
+    cache.max_bytes = size + 1
+    cache.load(zipped)
+    assert list(cache.entries)[0][0] == str(zipped.resolve())
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_cache_memory_maps_not_counted(tmp_path):
+    cache = DatapackageCache(max_bytes=0)
+    fp = copy_directory_fixture(tmp_path)
+    obj = cache.load(fp, mmap_mode="r")
+    assert cache.nbytes == 0
+    assert cache.load(fp, mmap_mode="r") is obj
+
+
+def test_cache_in_memory_data_objs_not_cached():
+    cache = DatapackageCache()
+    obj = {"datapackage": {"resources": []}}
+    assert cache.load(obj) is obj
+    assert not cache.entries
+
+
+def test_cache_invalidate_and_clear(tmp_path):
+    cache = DatapackageCache()
+    fp = copy_directory_fixture(tmp_path)
+    cache.load(fp)
+    cache.invalidate(fp)
+    assert not cache.entries
+    cache.load(fp)
+    cache.clear()
+    assert not cache.entries
+
+
+def test_lca_use_cache():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    first = LCA({3: 1}, [fp], use_cache=True)
+    second = LCA({4: 1}, [fp], use_cache=True)
+    assert first.data_objs[0] is second.data_objs[0]
+    first.lci()
+    first.lcia()
+    second.lci()
+    second.lcia()
+    assert first.score == 30
+    assert second.score == 200 + 30 / 2
+
+
+def test_matrix_cache_lca(tmp_path):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    first = LCA({3: 1}, [fp], matrix_cache=tmp_path)
+    first.lci()
+    first.lcia()
+    assert len(list(tmp_path.iterdir())) == 2
+
+    second = LCA({3: 1}, [fp], matrix_cache=MatrixCache(tmp_path), lazy=True)
+    second.lci()
+    second.lcia()
+    assert not second.data_objs[0].loaded
+    assert isinstance(second.tech_params, np.memmap)
+    assert second.score == first.score == 30
+    assert second.product_dict == first.product_dict
+    assert second.biosphere_dict == first.biosphere_dict
+    assert np.allclose(
+        second.technosphere_matrix.toarray(), first.technosphere_matrix.toarray()
+    )
+    second.redo_lcia({4: 1})
+    assert second.score == 200 + 30 / 2
+
+
+def test_matrix_cache_monte_carlo(tmp_path):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    next(MonteCarloLCA({3: 1}, [fp], matrix_cache=tmp_path))
+    assert next(MonteCarloLCA({3: 1}, [fp], matrix_cache=tmp_path)) > 0
+
+
+def test_matrix_cache_key_changes_with_data(tmp_path):
+    cache = MatrixCache(tmp_path)
+    fp = fixtures_dir / "basic-cp-directory"
+    data_objs = [load_data_obj(fp)]
+    key = cache.key(data_objs, ("technosphere",))
+    assert key == cache.key([load_data_obj(fp)], ("technosphere",))
+    assert key != cache.key(data_objs, ("biosphere",))
+    assert key != cache.key(data_objs, ("technosphere",), parent="foo")
+
+
+def test_matrix_cache_in_memory_resources_hashed(tmp_path):
+    cache = MatrixCache(tmp_path)
+    array = load_data_obj(fixtures_dir / "basic-cp-directory")["basic-technosphere.npy"]
+    resource = {"path": "a.npy", "matrix": "technosphere"}
+    data_obj = {"datapackage": {"resources": [resource]}, "a.npy": array}
+    key = cache.key([data_obj], ("technosphere",))
+    modified = array.copy()
+    modified["amount"][0] = 42
+    other = {"datapackage": {"resources": [resource]}, "a.npy": modified}
+    assert key != cache.key([other], ("technosphere",))
+
+
+def test_matrix_hash():
+    matrix = benchmark_matrix(20)
+    assert matrix_hash(matrix) == matrix_hash(matrix.copy())
+    changed = matrix.copy()
+    changed.data[0] += 1
+    assert matrix_hash(matrix) != matrix_hash(changed)
+    assert matrix_hash(matrix) != matrix_hash(matrix.tocsr())
+
+
+def test_factorization_cache_reuse():
+    cache = FactorizationCache()
+    solver = SuperLUSolver()
+    matrix = benchmark_matrix(20)
+    first = cache.factorize(solver, matrix)
+    assert cache.factorize(SuperLUSolver(), matrix.copy()) is first
+    assert cache.factorize(SuperLUSolver(permc_spec="NATURAL"), matrix) is not first
+    assert cache.nbytes > 0
+    cache.clear()
+    assert cache.factorize(solver, matrix) is not first
+
+
+def test_factorization_cache_eviction():
+    solver = SuperLUSolver()
+    first, second = benchmark_matrix(50, seed=1), benchmark_matrix(50, seed=2)
+    sizes = FactorizationCache()
+    sizes.factorize(solver, first)
+    sizes.factorize(solver, second)
+    cache = FactorizationCache(max_bytes=max(nbytes for _, nbytes in sizes.entries.values()))
+    cache.factorize(solver, first)
+    cache.factorize(solver, second)
+    assert len(cache.entries) == 1
+    assert cache.key(solver, second) in cache.entries
+
+
+def test_lca_cache_factorization():
+    factorization_cache.clear()
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    first = LCA({3: 1}, [fp], cache_factorization=True)
+    first.lci()
+    second = LCA({4: 1}, [fp], cache_factorization=True)
+    second.lci()
+    assert second.solver is first.solver
+    assert len(factorization_cache.entries) == 1
+
+    second.lcia()
+    second.rebuild_technosphere_matrix(second.tech_params["amount"] * 2)
+    assert not hasattr(second, "solver")
+    second.redo_lcia({4: 1})
+    assert second.solver is not first.solver
+    assert np.isclose(second.score, (200 + 30 / 2) / 2)
+    factorization_cache.clear()
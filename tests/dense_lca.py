@@ -0,0 +1,38 @@
+from bw_calc import MonteCarloLCA
+from bw_calc.dense_lca import DenseLCA, DenseMonteCarloLCA
+from pathlib import Path
+import numpy as np
+
+fixtures_dir = Path(__file__, "..").resolve() / "fixtures"
+
+
+def get_args():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    return {3: 1}, [fp]
+
+
+def test_dense_lca_keeps_factorization():
+    lca = DenseLCA(*get_args())
+    lca.lci()
+    lca.lcia()
+    assert np.isclose(lca.score, 30)
+    solver = lca.solver
+    lca.redo_lcia({4: 1})
+    assert lca.solver is solver
+    assert np.isclose(lca.score, 200 + 30 / 2)
+    assert np.allclose(lca.lcia_many([{3: 1}, {4: 1}]), [30, 215])
+
+
+def test_dense_monte_carlo_batch():
+    mc = DenseMonteCarloLCA(*get_args(), seed=3, batch_size=4)
+    reference = MonteCarloLCA(*get_args(), seed=3)
+    scores = mc.batch(6)
+    assert scores.shape == (6,)
+    assert np.allclose(scores, [next(reference) for _ in range(6)])
+
+
+def test_dense_monte_carlo_iteration():
+    mc = DenseMonteCarloLCA(*get_args(), seed=3, batch_size=4)
+    reference = MonteCarloLCA(*get_args(), seed=3)
+    for _ in range(6):
+        assert np.isclose(next(mc), next(reference))
@@ -1,5 +1,5 @@
 import numpy as np
-from bw_calc.indexing import index_with_searchsorted, index_with_arrays
+from bw_calc.indexing import IndexMapping, index_with_searchsorted, index_with_arrays
 import pytest
 
 from bw_calc.utils import MAX_SIGNED_32BIT_INT
@@ -13,6 +13,11 @@ def test_index_with_searchsorted():
     assert result == mapping
     assert np.allclose(expected, output)
 
+def test_index_with_searchsorted_returns_index_mapping():
+    result = index_with_searchsorted(np.array([4, 8, 6, 2, 4]), np.zeros(5))
+    assert isinstance(result, IndexMapping)
+    assert np.array_equal(result.key_array, [2, 4, 6, 8])
+
 def test_index_with_searchsorted_preserves_dtype():
     inpt = np.array([1, 2, 3, 6, 9, 12, 9, 6, 5])
     output = np.zeros(inpt.size, dtype=np.uint32)
@@ -41,3 +46,89 @@ def test_index_with_arrays_negative_error():
     with pytest.raises(ValueError):
         index_with_arrays(inpt, output, mapping)
 
+
+def test_index_with_arrays_index_mapping():
+    inpt = np.array([1, 2, 3, 6, 9, 12, 9, 6, 5])
+    mapping = IndexMapping([1, 3, 5, 6, 9], [0, 2, 3, 4, 5])
+    expected = np.array([0, MAX_SIGNED_32BIT_INT, 2, 4, 5, MAX_SIGNED_32BIT_INT, 5, 4, 3])
+    output = np.zeros(inpt.size)
+    index_with_arrays(inpt, output, mapping)
+    assert np.allclose(output, expected)
+
+def test_index_mapping_mapping_protocol():
+    mapping = IndexMapping([9, 3, 5], [0, 1, 2])
+    assert mapping == {3: 1, 5: 2, 9: 0}
+    assert mapping[9] == 0
+    assert 5 in mapping
+    assert 4 not in mapping
+    assert "foo" not in mapping
+    assert list(mapping) == [3, 5, 9]
+    assert len(mapping) == 3
+    assert dict(mapping.items()) == {3: 1, 5: 2, 9: 0}
+    with pytest.raises(KeyError):
+        mapping[4]
+    with pytest.raises(KeyError):
+        mapping[3.7]
+    assert mapping.get(3.7) is None
+    assert "3" not in mapping
+    assert mapping[3.0] == mapping[np.int64(3)] == 1
+
+def test_index_mapping_vectorized_lookup():
+    mapping = IndexMapping([10, 20, 30])
+    assert np.array_equal(mapping.lookup([30, 10, 15]), [2, 0, MAX_SIGNED_32BIT_INT])
+    assert np.array_equal(mapping.reverse_lookup([2, 0]), [30, 10])
+    with pytest.raises(KeyError):
+        mapping.reverse_lookup([3])
+
+def test_index_mapping_reversed():
+    mapping = IndexMapping([10, 20, 30], [2, 0, 1])
+    assert mapping.reversed() == {2: 10, 0: 20, 1: 30}
+    assert mapping.reversed().reversed() is mapping
+
+def test_index_mapping_from_dict():
+    mapping = IndexMapping.from_dict({5: 1, 2: 0})
+    assert mapping == {5: 1, 2: 0}
+    assert IndexMapping.from_dict(mapping) is mapping
+
+def test_index_mapping_empty():
+    mapping = IndexMapping([])
+    assert not mapping
+    assert np.array_equal(mapping.lookup([1]), [MAX_SIGNED_32BIT_INT])
+
+def test_index_mapping_duplicate_keys_error():
+    with pytest.raises(ValueError):
+        IndexMapping([1, 2, 1])
+
+def test_index_with_arrays_large_sparse_keys():
+    keys = np.array([3, 2 ** 40, 2 ** 62 + 7])
+    mapping = IndexMapping(keys, [0, 1, 2])
+    inpt = np.array([2 ** 62 + 7, 3, 5, 2 ** 40], dtype=np.int64)
+    output = np.zeros(inpt.size, dtype=np.uint32)
+    index_with_arrays(inpt, output, mapping)
+    assert np.array_equal(output, [2, 0, MAX_SIGNED_32BIT_INT, 1])
+    assert mapping.dense_table() is None
+
+def test_index_with_arrays_uint64_keys():
+    for keys in ([5, 2 ** 62 + 1, 2 ** 62 + 3], [5, 2 ** 63 + 1, 2 ** 64 - 1]):
+        keys = np.array(keys, dtype=np.uint64)
+        output = np.zeros(keys.size, dtype=np.uint32)
+        mapping = index_with_searchsorted(keys, output)
+        assert mapping.key_array.dtype == np.uint64
+        inpt = keys[[2, 0, 1]]
+        index_with_arrays(inpt, output, mapping)
+        assert np.array_equal(output, [2, 0, 1])
+        assert mapping[int(keys[1])] == 1
+        assert mapping.lookup(np.array([-1, 6], dtype=np.int64)).tolist() == [MAX_SIGNED_32BIT_INT] * 2
+        assert mapping.lookup(np.array([int(keys[2]) - 1], dtype=np.uint64)).tolist() == [MAX_SIGNED_32BIT_INT]
+        assert IndexMapping.from_dict(dict(mapping)) == mapping
+    with pytest.raises(TypeError):
+        mapping.lookup(keys.astype(np.float64))
+
+def test_index_mapping_dense_table():
+    mapping = IndexMapping(np.arange(5000, 10000, 2))
+    offset, table = mapping.dense_table()
+    assert offset == 5000
+    assert mapping.dense_table()[1] is table
+    inpt = np.array([4998, 5000, 5001, 9998, 10000], dtype=np.uint32)
+    expected = np.array([MAX_SIGNED_32BIT_INT, 0, MAX_SIGNED_32BIT_INT, 2499, MAX_SIGNED_32BIT_INT])
+    assert np.array_equal(mapping.lookup(inpt), expected)
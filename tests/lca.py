@@ -2,9 +2,10 @@ from bw_processing import (
     create_calculation_package,
     dictionary_formatter,
 )
-from bw_calc import LCA
+from bw_calc import LCA, MatrixBuilder
 from bw_calc.errors import NoArrays, OutsideTechnosphere, NonsquareTechnosphere
 from pathlib import Path
+from scipy import sparse
 import numpy as np
 import pytest
 
@@ -31,6 +32,70 @@ def test_basic_calculation_directory():
     assert lca.score == 200 + 30 / 2
 
 
+def test_basic_calculation_directory_mmap():
+    fp = fixtures_dir / "basic-cp-directory"
+    lca = LCA({3: 1}, [fp], mmap_mode="r")
+    lca.lci()
+    lca.lcia()
+    assert lca.score == 30
+    assert lca.tech_params["row_index"].max() == 1
+    lca.redo_lcia({4: 1})
+    assert lca.score == 200 + 30 / 2
+
+
+def test_basic_calculation_lazy():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], lazy=True)
+    lca.lci()
+    assert "basic-characterization.npy" not in lca.data_objs[0].loaded
+    lca.lcia()
+    assert lca.score == 30
+
+
+def test_basic_calculation_max_workers():
+    fps = [
+        fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip",
+    ]
+    lca = LCA({3: 1}, fps, lazy=True, max_workers=4)
+    lca.lci()
+    lca.lcia()
+    assert lca.score == 30
+
+
+def test_params_only_matrix_fields():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    assert set(lca.tech_params.dtype.names) == set(MatrixBuilder.fields)
+
+
+def test_reverse_dict():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    rev_activity, rev_product, rev_bio = lca.reverse_dict()
+    assert rev_activity == {0: 5, 1: 6}
+    assert rev_product == {0: 3, 1: 4}
+    assert rev_bio == {0: 1, 1: 2}
+
+
+def test_rebuild_matrices_with_pattern():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    lca.lcia()
+    technosphere = lca.technosphere_matrix.toarray()
+    lca.rebuild_technosphere_matrix(lca.tech_params["amount"])
+    lca.rebuild_biosphere_matrix(lca.bio_params["amount"] * 2)
+    lca.rebuild_characterization_matrix(lca.cf_params["amount"])
+    assert lca.technosphere_pattern is not None
+    assert np.allclose(lca.technosphere_matrix.toarray(), technosphere)
+    lca.redo_lcia({3: 1})
+    assert np.allclose(lca.score, 60)
+    lca.lci()
+    assert lca.technosphere_pattern is None
+
+
 def test_basic_calculation_in_memory():
     resources = [
         {
@@ -395,3 +460,183 @@ def test_multiple_lci_lcia_calculations():
     assert lca.score == 30
     lca.redo_lcia({4: 1})
     assert lca.score == 200 + 30 / 2
+
+
+def test_build_demand_matrix():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    matrix = lca.build_demand_matrix([{3: 1}, {4: 2, 3: 0.5}, {}])
+    assert matrix.shape == (2, 3)
+    assert np.allclose(matrix.toarray(), [[1, 0.5, 0], [0, 2, 0]])
+    with pytest.raises(OutsideTechnosphere):
+        lca.build_demand_matrix([{3: 1}, {100: 1}])
+    with pytest.raises(ValueError):
+        lca.build_demand_matrix([{5: 1}])
+
+
+def test_lci_many_lcia_many():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    demands = [{3: 1}, {4: 1}, {3: 2, 4: 1}]
+    supply = lca.lci_many(demands)
+    assert supply.shape == (2, 3)
+    for index, demand in enumerate(demands):
+        single = LCA(demand, [fp])
+        single.lci()
+        assert np.allclose(supply[:, index], single.supply_array)
+    scores = lca.lcia_many(demands)
+    assert np.allclose(scores, [30, 215, 275])
+    assert np.allclose(lca.lcia_many(demands, chunk_size=2), scores)
+    assert lca.lcia_many([]).shape == (0,)
+
+
+@pytest.mark.parametrize("solver", ["scipy", "superlu", "dense", "krylov", "block_triangular"])
+def test_activity_scores(solver):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], solver=solver)
+    scores = lca.activity_scores()
+    assert np.allclose(scores[[lca.product_dict[3], lca.product_dict[4]]], [30, 215])
+    lca.lci()
+    lca.lcia()
+    assert np.isclose(scores @ lca.demand_array, lca.score)
+
+
+def test_activity_scores_keeps_block_triangular_decomposition():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], solver="block_triangular")
+    lca.lci(factorize=True)
+    decomposition = lca.solver_backend.decomposition
+    lca.activity_scores()
+    assert lca.solver_backend.decomposition is decomposition
+
+
+@pytest.mark.parametrize("foreground", [([3], [5]), ([4], [6])])
+def test_foreground_background(foreground):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], foreground=foreground)
+    lca.lci(factorize=True)
+    lca.lcia()
+    assert lca.solver_backend.name == "schur"
+    assert np.isclose(lca.score, 30)
+    lca.redo_lcia({4: 1})
+    assert np.isclose(lca.score, 200 + 30 / 2)
+
+
+@pytest.mark.parametrize("max_rank", [0, 1, 10])
+def test_lci_with_edits(max_rank):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci(factorize=True)
+    lca.lcia()
+    solver = lca.solver
+    # Activity 6 needs 0.25 instead of 0.5 of product 3, and makes 2 of product 4
+    edits = [(3, 6, -0.25), (4, 6, 2.0)]
+
+    expected = LCA({4: 1}, [fp])
+    expected.lci()
+    expected.technosphere_matrix = expected.technosphere_matrix.tolil()
+    expected.technosphere_matrix[0, 1] = -0.25
+    expected.technosphere_matrix[1, 1] = 2.0
+    expected.technosphere_matrix = expected.technosphere_matrix.tocsr()
+    expected.redo_lci()
+    expected.lcia()
+
+    supply = lca.lci_with_edits(edits, demand={4: 1}, max_rank=max_rank)
+    assert np.allclose(supply, expected.supply_array)
+    assert np.isclose(lca.lcia_with_edits(edits, demand={4: 1}, max_rank=max_rank), expected.score)
+    assert np.isclose(lca.lcia_with_edits([]), 30)
+    assert lca.solver is solver
+    assert lca.score == 30
+
+
+def test_power_series_lcia_acyclic():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({4: 1}, [fp])
+    score = lca.power_series_lcia(keep_tiers=True)
+    assert np.isclose(score, 200 + 30 / 2)
+    assert np.allclose(lca.tier_scores, [200, 15, 0][:len(lca.tier_scores)])
+    assert lca.score_error_bound == 0
+    assert np.allclose(sum(lca.tiers), lca.supply_array)
+
+
+def test_power_series_lcia_bound():
+    matrix = sparse.csr_matrix(np.array([[1, -0.5], [-0.4, 2]]))
+    lca = LCA({3: 1}, [fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"])
+    lca.lci()
+    lca.technosphere_matrix = matrix
+    lca.redo_lci()
+    lca.lcia()
+    approximate = lca.power_series_lcia(tolerance=1e-3)
+    assert 0 < abs(approximate - lca.score) <= lca.score_error_bound <= 1e-3 * abs(approximate)
+    assert np.abs(lca.supply_array - np.linalg.solve(matrix.toarray(), lca.demand_array)).sum() <= lca.supply_error_bound
+    lca.power_series_lcia(max_tiers=3)
+    assert len(lca.tier_scores) == 3
+    with pytest.raises(ValueError):
+        lca.power_series_lcia(max_tiers=0)
+
+
+def test_power_series_lcia_no_bound_zero_score_tiers():
+    # Acyclic chain where each activity needs two units of the next; only the last one emits
+    lca = LCA({3: 1}, [fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"])
+    lca.load_lci_data()
+    lca.load_lcia_data()
+    lca.technosphere_matrix = sparse.csr_matrix(np.array([[1., 0, 0], [-2, 1, 0], [0, -2, 1]]))
+    lca.biosphere_matrix = sparse.csr_matrix(np.array([[0, 0, 0.1], [0, 0, 0]]))
+    lca.demand_array = np.array([1., 0, 0])
+    assert np.isclose(lca.power_series_lcia(), 4)
+    assert np.allclose(lca.tier_scores[:3], [0, 0, 4])
+    assert lca.score_error_bound == 0
+
+
+def test_lazy_inventory():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    assert not hasattr(lca, "inventory")
+    lca.lci()
+    lca.lcia()
+    assert lca.score == 30
+    assert getattr(lca, "_inventory", None) is None
+    assert getattr(lca, "_characterized_inventory", None) is None
+    assert lca.characterized_inventory.sum() == 30
+    inventory = lca.inventory
+    assert lca.inventory is inventory
+    lca.redo_lcia({4: 1})
+    assert lca.inventory is not inventory
+    assert np.isclose(lca.characterized_inventory.sum(), lca.score)
+    assert np.isclose(lca.score, 200 + 30 / 2)
+
+
+def test_score_after_in_place_changes():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    lca.lcia()
+    assert lca.score == 30
+    lca.biosphere_matrix.data *= 2
+    lca.redo_lci({3: 1})
+    lca.redo_lcia({3: 1})
+    assert lca.score == 60
+    assert lca.characterized_inventory.sum() == 60
+    lca.characterization_vector *= 2
+    lca.lcia_calculation()
+    assert lca.score == 120
+
+
+def test_characterization_vector():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp])
+    lca.lci()
+    lca.lcia()
+    assert lca.characterization_vector.shape == (2,)
+    assert np.allclose(lca.characterization_vector, [10, 100])
+    assert np.allclose(lca.characterization_matrix.toarray(), np.diag([10, 100]))
+
+    lca.rebuild_characterization_matrix(lca.cf_params["amount"] * 2)
+    lca.lcia_calculation()
+    assert lca.score == 60
+    assert lca.characterized_inventory.sum() == 60
+
+    lca.characterization_matrix = sparse.diags([1., 1.])
+    lca.lcia_calculation()
+    assert lca.score == 3
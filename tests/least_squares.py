@@ -0,0 +1,77 @@
+from bw_processing import create_calculation_package, dictionary_formatter
+from bw_calc import LCA
+from bw_calc.errors import NonsquareTechnosphere
+from bw_calc.least_squares import LeastSquaresLCA
+import numpy as np
+import pytest
+
+
+def overdetermined_package():
+    resources = [
+        {
+            "name": "a",
+            "path": "a.npy",
+            "matrix": "technosphere",
+            "data": [
+                dictionary_formatter({"row": 3, "col": 5, "amount": 1.0}),
+                dictionary_formatter({"row": 4, "col": 6, "amount": 1.0}),
+                dictionary_formatter({"row": 8, "col": 6, "amount": 1.0}),
+                dictionary_formatter({"row": 8, "col": 5, "amount": 0.5}),
+                dictionary_formatter({"row": 3, "col": 6, "amount": 0.5, "flip": True}),
+            ],
+        },
+        {
+            "name": "basic-biosphere",
+            "path": "b.npy",
+            "matrix": "biosphere",
+            "data": [
+                dictionary_formatter({"row": 1, "col": 5, "amount": 3.0}),
+                dictionary_formatter({"row": 2, "col": 6, "amount": 2.0}),
+            ],
+        },
+        {
+            "name": "basic-characterization",
+            "path": "c.npy",
+            "matrix": "characterization",
+            "data": [
+                dictionary_formatter({"row": 1, "amount": 10.0}),
+                dictionary_formatter({"row": 2, "amount": 100.0}),
+            ],
+        },
+    ]
+    return create_calculation_package(
+        name="test-fixture-overdetermined", resources=resources, path=None, compress=False
+    )
+
+
+def expected_supply(lca, demand):
+    lca.build_demand_array(demand)
+    return np.linalg.lstsq(lca.technosphere_matrix.toarray(), lca.demand_array, rcond=None)[0]
+
+
+@pytest.mark.parametrize("factorize", [False, True])
+def test_least_squares(factorize):
+    lca = LeastSquaresLCA({4: 1}, [overdetermined_package()])
+    lca.lci(factorize=factorize)
+    assert lca.technosphere_matrix.shape == (3, 2)
+    assert np.allclose(lca.supply_array, expected_supply(lca, {4: 1}))
+    lca.redo_lci({8: 1, 3: 2})
+    assert np.allclose(lca.supply_array, expected_supply(lca, {8: 1, 3: 2}), atol=1e-5)
+    assert hasattr(lca, "solver") == factorize
+
+
+def test_least_squares_warm_start():
+    lca = LeastSquaresLCA({4: 1}, [overdetermined_package()], warm_start=True)
+    lca.lci()
+    first = lca.guess.copy()
+    lca.redo_lci({4: 1.1})
+    assert np.allclose(lca.supply_array, expected_supply(lca, {4: 1.1}), atol=1e-5)
+    assert not np.allclose(lca.guess, first)
+
+
+def test_nonsquare_matrix_cache_entry(tmp_path):
+    package = overdetermined_package()
+    LeastSquaresLCA({4: 1}, [package], matrix_cache=tmp_path).lci()
+    lca = LCA({4: 1}, [package], matrix_cache=tmp_path)
+    with pytest.raises(NonsquareTechnosphere):
+        lca.lci()
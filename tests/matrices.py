@@ -1,3 +1,91 @@
+from bw_calc.matrices import MatrixBuilder, SparsityPattern, VectorPattern
+import numpy as np
+
+
+def parameter_array():
+    array = np.zeros(5, dtype=[
+        ("row_index", np.uint32),
+        ("col_index", np.uint32),
+        ("amount", np.float32),
+        ("flip", bool),
+    ])
+    array["row_index"] = [2, 0, 2, 1, 0]
+    array["col_index"] = [1, 2, 1, 1, 0]
+    array["amount"] = [1, 2, 3, 4, 0]
+    array["flip"] = [False, True, False, False, False]
+    return array
+
+
+def test_sparsity_pattern_same_as_coo():
+    array = parameter_array()
+    r = [0, 0, 0]
+    expected = MatrixBuilder.build_matrix(array, r, r)
+    pattern = MatrixBuilder.build_pattern(array, r, r)
+    assert pattern.nnz == expected.nnz == 4
+    for vector in (array["amount"], np.arange(5, dtype=np.float64)):
+        expected = MatrixBuilder.build_matrix(array, r, r, new_data=vector)
+        matrix = MatrixBuilder.build_matrix(array, r, r, new_data=vector, pattern=pattern)
+        assert np.array_equal(matrix.indptr, expected.indptr)
+        assert np.array_equal(matrix.indices, expected.indices)
+        assert np.allclose(matrix.data, expected.data)
+
+
+def test_build_matrix_csc():
+    array = parameter_array()
+    r = [0, 0, 0]
+    matrix = MatrixBuilder.build_matrix(array, r, r, format="csc")
+    assert matrix.format == "csc"
+    assert np.allclose(matrix.toarray(), MatrixBuilder.build_matrix(array, r, r).toarray())
+
+
+def test_sparsity_pattern_csc_same_as_coo():
+    array = parameter_array()
+    r = [0, 0, 0]
+    pattern = MatrixBuilder.build_pattern(array, r, r, format="csc")
+    vector = np.arange(5, dtype=np.float64)
+    expected = MatrixBuilder.build_matrix(array, r, r, new_data=vector, format="csc")
+    matrix = pattern.matrix(vector)
+    assert matrix.format == "csc"
+    assert np.array_equal(matrix.indptr, expected.indptr)
+    assert np.array_equal(matrix.indices, expected.indices)
+    assert np.allclose(matrix.data, expected.data)
+
+
+def test_sparsity_pattern_one_d():
+    array = parameter_array()
+    r = [0, 0, 0]
+    pattern = MatrixBuilder.build_pattern(array, r, one_d=True)
+    matrix = pattern.matrix(np.ones(5))
+    assert np.allclose(matrix.toarray(), np.diag([0, 1, 2]))
+
+
+def test_build_one_d_vector():
+    array = parameter_array()
+    r = [0, 0, 0]
+    vector = MatrixBuilder.build_matrix(array, r, one_d=True, format="vector")
+    expected = MatrixBuilder.build_matrix(array, r, one_d=True).diagonal()
+    assert isinstance(vector, np.ndarray)
+    assert np.allclose(vector, expected)
+    pattern = MatrixBuilder.build_pattern(array, r, one_d=True, format="vector")
+    assert np.allclose(pattern.matrix(array["amount"]), expected)
+
+
+def test_vector_pattern_assignment():
+    pattern = VectorPattern([2, 0], 4, flip=[False, True])
+    assert pattern.unique
+    assert np.allclose(pattern.matrix(np.array([1., 2.])), [-2, 0, 1, 0])
+    assert not VectorPattern([1, 1], 2).unique
+    assert np.allclose(VectorPattern([1, 1], 2).matrix(np.array([1., 2.])), [0, 3])
+
+
+def test_sparsity_pattern_shares_structure():
+    pattern = SparsityPattern([0, 1], [1, 0], (2, 2))
+    first, second = pattern.matrix(np.ones(2)), pattern.matrix(np.zeros(2))
+    assert np.shares_memory(first.indices, second.indices)
+    assert not np.shares_memory(first.data, second.data)
+    assert np.allclose(first.toarray(), [[0, 1], [1, 0]])
+
+
 # # -*- coding: utf-8 -*-
 # from __future__ import print_function, unicode_literals
 # from eight import *
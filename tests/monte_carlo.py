@@ -1,10 +1,11 @@
-from bw_calc import MonteCarloLCA, IterativeMonteCarloLCA
+from bw_calc import MonteCarloLCA, IterativeMonteCarloLCA, ParallelMonteCarlo
 from numbers import Number
 from pathlib import Path
 import numpy as np
 import os
 import platform
 import pytest
+import warnings
 
 
 no_pool = pytest.mark.skipif(platform.system() == "Windows",
@@ -34,11 +35,62 @@ def test_monte_carlo_as_iterator():
         assert x > 0
         break
 
+def test_monte_carlo_no_format_conversion():
+    from scipy.sparse import SparseEfficiencyWarning
+    mc = MonteCarloLCA(*get_args())
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SparseEfficiencyWarning)
+        next(mc)
+        next(mc)
+    assert mc.technosphere_matrix.format == mc.technosphere_format
+
+def test_monte_carlo_fixed_ordering():
+    mc = MonteCarloLCA(*get_args(), seed=7, fixed_ordering=True)
+    reference = MonteCarloLCA(*get_args(), seed=7)
+    for _ in range(5):
+        assert np.isclose(next(mc), next(reference))
+    assert mc.solver_backend.column_permutation is not None
+    assert mc.technosphere_matrix.format == "csc"
+
+
 def test_iterative_solving():
     mc = IterativeMonteCarloLCA(*get_args())
     assert next(mc)
 
 
+@pytest.mark.parametrize("iter_solver", ["gmres", "bicgstab", "cgs"])
+def test_iterative_solving_preconditioner(iter_solver):
+    mc = IterativeMonteCarloLCA(
+        *get_args(), iter_solver=iter_solver, use_preconditioner=True, seed=11, tol=1e-10
+    )
+    reference = MonteCarloLCA(*get_args(), seed=11)
+    for _ in range(5):
+        assert np.isclose(next(mc), next(reference))
+    assert mc.telemetry["preconditioner_builds"] >= 1
+    assert len(mc.telemetry["iterations"]) == 4
+    assert len(mc.telemetry["residuals"]) == 4
+    assert mc.telemetry["direct_solves"] == 1 + mc.telemetry["fallbacks"]
+
+
+def test_iterative_solving_fallback():
+    def diverging(A, b, **kwargs):
+        return np.zeros_like(b), 1
+
+    mc = IterativeMonteCarloLCA(*get_args(), iter_solver=diverging, seed=11)
+    reference = MonteCarloLCA(*get_args(), seed=11)
+    next(mc), next(reference)
+    assert np.isclose(next(mc), next(reference))
+    assert mc.telemetry["fallbacks"] == 1
+    assert mc.telemetry["direct_solves"] == 2
+
+
+@no_pool
+def test_parallel_monte_carlo():
+    results = ParallelMonteCarlo(*get_args(), iterations=4, cpus=2).calculate()
+    assert len(results) >= 4
+    assert all(x > 0 for x in results)
+
+
 # @no_pool
 # def test_multi_mc(background):
 #     mc = MultiMonteCarlo(
@@ -134,3 +186,18 @@ def test_iterative_solving():
 #     assert isinstance(results, list)
 #     assert isinstance(results[0], Number)
 #     assert results[0] > 0
+
+
+def test_monte_carlo_foreground():
+    mc = MonteCarloLCA(*get_args(), seed=5, foreground=([4], [6]))
+    reference = MonteCarloLCA(*get_args(), seed=5)
+    for _ in range(3):
+        assert np.isclose(next(mc), next(reference))
+
+
+def test_monte_carlo_score_only():
+    mc = MonteCarloLCA(*get_args(), seed=9)
+    for _ in range(3):
+        score = next(mc)
+        assert getattr(mc, "_inventory", None) is None
+    assert np.isclose(mc.characterized_inventory.sum(), score)
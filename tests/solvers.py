@@ -0,0 +1,218 @@
+from bw_calc import LCA
+from bw_calc.dense_lca import DenseLCA
+from bw_calc.solvers import (
+    BlockTriangularSolver,
+    DenseSolver,
+    KrylovSolver,
+    SchurComplementSolver,
+    Solver,
+    SuperLUSolver,
+    available_solvers,
+    benchmark_matrix,
+    calibrate,
+    get_solver,
+    load_calibration,
+    select_solver,
+)
+from pathlib import Path
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+import numpy as np
+import pytest
+
+fixtures_dir = Path(__file__, "..").resolve() / "fixtures"
+
+
+@pytest.mark.parametrize("name", available_solvers())
+def test_solvers_agree(name):
+    matrix = benchmark_matrix(100)
+    b = np.arange(100, dtype=float)
+    expected = np.linalg.solve(matrix.toarray(), b)
+    solver = get_solver(name)
+    assert np.allclose(solver.solve(matrix, b), expected)
+    assert np.allclose(solver.factorize(matrix)(b), expected)
+
+
+def test_solver_multiple_right_hand_sides():
+    matrix = benchmark_matrix(50)
+    b = np.random.RandomState(1).random_sample((50, 3))
+    expected = np.linalg.solve(matrix.toarray(), b)
+    for name in ("superlu", "dense", "krylov"):
+        assert np.allclose(get_solver(name).factorize(matrix)(b), expected)
+
+
+def test_get_solver():
+    solver = DenseSolver()
+    assert get_solver(solver) is solver
+    assert isinstance(get_solver("krylov", method="bicgstab"), KrylovSolver)
+    assert isinstance(get_solver(), Solver)
+    with pytest.raises(ValueError):
+        get_solver("nope")
+    with pytest.raises(ValueError):
+        KrylovSolver(method="nope")
+
+
+def test_select_solver_heuristics():
+    empty = {"machine": "", "timings": {}}
+    assert select_solver(benchmark_matrix(20), empty).name == "dense"
+    assert select_solver(benchmark_matrix(5000), empty).name != "dense"
+
+
+def test_calibrate(tmp_path):
+    fp = tmp_path / "calibration.json"
+    calibration = calibrate(sizes=(10, 100), repeats=1, filepath=fp, solvers=["superlu", "dense"])
+    assert set(calibration["timings"]) == {"10", "100"}
+    assert load_calibration(fp) == calibration
+    calibration["timings"] = {"100": {"superlu": 1., "dense": 2.}}
+    assert select_solver(benchmark_matrix(1000), calibration).name == "superlu"
+    calibration["timings"] = {"20": {"dense": 1.}, "2000": {"superlu": 2., "dense": 1.}}
+    assert select_solver(benchmark_matrix(1500), calibration).name == "dense"
+    assert select_solver(benchmark_matrix(6000), calibration).name == "superlu"
+    assert select_solver(sparse.csc_matrix(np.ones((500, 500))), {"timings": {"500": {"superlu": 1.}}}).name == "dense"
+
+
+def test_load_calibration_other_machine(tmp_path):
+    fp = tmp_path / "calibration.json"
+    fp.write_text('{"machine": "elsewhere", "timings": {"10": {"dense": 1.0}}}')
+    assert load_calibration(fp) is None
+    assert load_calibration(tmp_path / "missing.json") is None
+
+
+@pytest.mark.parametrize("solver", ["superlu", "dense", "krylov", "block_triangular", "auto"])
+def test_lca_solver(solver):
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], solver=solver)
+    lca.lci(factorize=True)
+    lca.lcia()
+    assert np.isclose(lca.score, 30)
+    assert lca.technosphere_matrix.format == lca.solver_backend.format
+    lca.redo_lcia({4: 1})
+    assert np.isclose(lca.score, 200 + 30 / 2)
+
+
+def test_dense_lca():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = DenseLCA({3: 1}, [fp])
+    lca.lci()
+    lca.lcia()
+    assert lca.solver_backend.name == "dense"
+    assert np.isclose(lca.score, 30)
+
+
+@pytest.mark.parametrize("name", available_solvers())
+def test_solvers_transposed(name):
+    matrix = benchmark_matrix(60)
+    b = np.arange(60, dtype=float)
+    solver = get_solver(name)
+    transposed = solver.transposed(solver.factorize(matrix), solver.prepare(matrix))
+    assert np.allclose(transposed(b), np.linalg.solve(matrix.toarray().T, b))
+
+
+def test_superlu_fixed_ordering():
+    matrix = benchmark_matrix(80)
+    b = np.arange(80, dtype=float)
+    solver = SuperLUSolver.with_ordering(matrix)
+    changed = matrix.copy()
+    changed.data *= np.random.RandomState(3).uniform(0.9, 1.1, changed.nnz)
+    factorization = solver.factorize(changed)
+    assert np.allclose(factorization(b), np.linalg.solve(changed.toarray(), b))
+    assert np.allclose(
+        solver.transposed(factorization, changed)(b),
+        np.linalg.solve(changed.toarray().T, b)
+    )
+    assert solver.factorization_nbytes(factorization, changed) > 0
+
+
+def test_superlu_fixed_ordering_fill():
+    matrix = benchmark_matrix(500).tocsc()
+    colamd = sparse_linalg.splu(matrix, permc_spec="COLAMD")
+    natural = sparse_linalg.splu(matrix, permc_spec="NATURAL")
+    lu = SuperLUSolver.with_ordering(matrix).factorize(matrix).__self__.lu
+    assert lu.L.nnz + lu.U.nnz == colamd.L.nnz + colamd.U.nnz
+    assert lu.L.nnz + lu.U.nnz < natural.L.nnz + natural.U.nnz
+
+
+class SingleRHSSolver(SuperLUSolver):
+    multiple_rhs = False
+
+    def factorize(self, matrix):
+        solve = super().factorize(matrix)
+
+        def single(b):
+            assert np.ndim(b) == 1
+            return solve(b)
+
+        return single
+
+
+def test_solve_many_single_rhs_solver():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    lca = LCA({3: 1}, [fp], solver=SingleRHSSolver())
+    assert np.allclose(lca.lcia_many([{3: 1}, {4: 1}, {3: 2, 4: 1}]), [30, 215, 275])
+    assert lca.lci_many([]).shape == (2, 0)
+    assert np.isclose(lca.lcia_with_edits([(3, 6, -0.5)], {4: 1}), LCA({4: 1}, [fp]).lcia_with_edits([(3, 6, -0.5)]))
+
+
+def test_block_triangular_solver():
+    # Acyclic supply chain with two cycles: {2, 3} and {5, 6, 7}
+    matrix = sparse.eye(8, format="lil")
+    for row, col, value in [
+        (1, 0, -0.5), (2, 1, -0.2), (3, 2, -0.3), (2, 3, -0.4), (4, 3, -1),
+        (5, 4, -0.1), (6, 5, -0.5), (7, 6, -0.5), (5, 7, -0.5), (4, 0, -0.2),
+    ]:
+        matrix[row, col] = value
+    matrix = matrix.tocsr()
+    solver = BlockTriangularSolver()
+    b = np.arange(1, 9, dtype=float)
+    factorization = solver.factorize(matrix)
+    assert np.allclose(factorization(b), np.linalg.solve(matrix.toarray(), b))
+    both = np.column_stack([b, b[::-1]])
+    assert np.allclose(factorization(both), np.linalg.solve(matrix.toarray(), both))
+
+    decomposition = solver.decomposition
+    assert decomposition.n_components == 5
+    assert decomposition.largest_block == 3
+    changed = matrix.copy()
+    changed.data *= 1.1
+    factorization = solver.factorize(changed)
+    assert solver.decomposition is decomposition
+    transposed = solver.transposed(factorization, changed)
+    assert np.allclose(transposed(b), np.linalg.solve(changed.toarray().T, b))
+    assert np.allclose(transposed(both), np.linalg.solve(changed.toarray().T, both))
+    assert solver.decomposition is decomposition
+
+
+def test_block_triangular_solver_random():
+    matrix = benchmark_matrix(300, per_column=1)
+    b = np.ones(300)
+    solver = BlockTriangularSolver()
+    assert np.allclose(solver.solve(matrix, b), np.linalg.solve(matrix.toarray(), b))
+    assert solver.decomposition.n_components > 1
+
+
+def test_schur_complement_solver():
+    matrix = benchmark_matrix(100).tocsr()
+    foreground = np.arange(90, 100)
+    solver = SchurComplementSolver(foreground, foreground, background_solver="superlu")
+    b = np.zeros(100)
+    b[95] = 1
+    assert np.allclose(solver.factorize(matrix)(b), np.linalg.solve(matrix.toarray(), b))
+    b = np.arange(100, dtype=float)
+    factorization = solver.factorize(matrix)
+    assert np.allclose(factorization(b), np.linalg.solve(matrix.toarray(), b))
+    assert np.allclose(
+        solver.transposed(factorization, matrix)(b),
+        np.linalg.solve(matrix.toarray().T, b)
+    )
+
+    # New foreground values reuse the background factorization
+    background = solver.background
+    changed = matrix.tolil()
+    changed[90:, :] = changed[90:, :] * 1.5
+    changed[:, 90:] = changed[:, 90:] * 0.5
+    changed = changed.tocsr()
+    assert np.allclose(solver.factorize(changed)(b), np.linalg.solve(changed.toarray(), b))
+    assert solver.background is background
+
+    with pytest.raises(ValueError):
+        SchurComplementSolver([1, 2], [1])
@@ -3,9 +3,14 @@ from io import BytesIO
 import numpy as np
 import pytest
 import multiprocessing
+import zipfile
 from bw_calc.utils import (
+   LazyDatapackage,
+   concatenate_arrays,
+   filter_data_for_matrix,
    load_data_obj,
    get_seed,
+   load_zipped_array,
 )
 
 fixtures_dir = Path(__file__, "..").resolve() / "fixtures"
@@ -19,6 +24,142 @@ def test_load_data_obj_directory():
     pass
 
 
+def test_load_data_obj_directory_mmap():
+    obj = load_data_obj(fixtures_dir / "basic-cp-directory", mmap_mode="r")
+    array = obj["basic-technosphere.npy"]
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+
+
+def test_filter_data_for_matrix_mmap_zero_copy():
+    obj = load_data_obj(fixtures_dir / "basic-cp-directory", mmap_mode="r")
+    array = filter_data_for_matrix([obj], "technosphere")
+    assert array is obj["basic-technosphere.npy"]
+
+
+def test_filter_data_for_matrix_copies_writeable_arrays():
+    obj = load_data_obj(fixtures_dir / "basic-cp-directory")
+    array = filter_data_for_matrix([obj], "technosphere")
+    assert array is not obj["basic-technosphere.npy"]
+    assert np.allclose(array["amount"], obj["basic-technosphere.npy"]["amount"])
+
+
+def test_concatenate_arrays():
+    first = np.array([(1, 2.0), (3, 4.0)], dtype=[("a", np.int64), ("b", np.float64)])
+    second = np.array([(5.0, 6)], dtype=[("b", np.float32), ("a", np.int32)])
+    result = concatenate_arrays([first, second])
+    assert result.dtype == first.dtype
+    assert np.array_equal(result["a"], [1, 3, 6])
+    assert np.allclose(result["b"], [2, 4, 5])
+    assert not np.shares_memory(result, first)
+
+
+def test_concatenate_arrays_fields():
+    first = np.array([(1, 2.0), (3, 4.0)], dtype=[("a", np.int64), ("b", np.float64)])
+    result = concatenate_arrays([first, first], fields=["b"])
+    assert result.dtype.names == ("b",)
+    assert np.allclose(result["b"], [2, 4, 2, 4])
+
+
+def test_filter_data_for_matrix_fields():
+    fp = fixtures_dir / "basic-cp-directory"
+    fields = ("row_value", "amount")
+    for obj in (load_data_obj(fp), load_data_obj(fp, mmap_mode="r")):
+        array = filter_data_for_matrix([obj, obj], "technosphere", fields=fields)
+        assert array.dtype.names == fields
+        assert array.shape == (6,)
+        assert array.flags.writeable
+        assert np.array_equal(
+            array["row_value"][:3], obj["basic-technosphere.npy"]["row_value"]
+        )
+
+
+def test_lazy_datapackage_zipfile():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    obj = load_data_obj(fp, lazy=True)
+    assert isinstance(obj, LazyDatapackage)
+    assert not obj.loaded
+    array = filter_data_for_matrix([obj], "biosphere")
+    assert array.shape == (2,)
+    assert list(obj.loaded) == ["basic-biosphere.npy"]
+
+
+def test_lazy_datapackage_directory():
+    obj = LazyDatapackage(fixtures_dir / "basic-cp-directory")
+    assert len(obj) == 4
+    assert obj["basic-characterization.npy"].shape == (2,)
+    assert list(obj.loaded) == ["basic-characterization.npy"]
+    with pytest.raises(KeyError):
+        obj["missing.npy"]
+
+
+def test_lazy_datapackage_missing_path():
+    with pytest.raises(ValueError):
+        LazyDatapackage(fixtures_dir / "missing")
+
+
+def zip_directory_fixture(path, compression):
+    directory = fixtures_dir / "basic-cp-directory"
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        for fp in directory.iterdir():
+            zf.write(fp, fp.name)
+    return path
+
+
+def test_load_data_obj_zipfile_stored_mmap(tmp_path):
+    fp = zip_directory_fixture(tmp_path / "stored.zip", zipfile.ZIP_STORED)
+    obj = load_data_obj(fp, mmap_mode="r")
+    expected = load_data_obj(fixtures_dir / "basic-cp-directory")
+    array = obj["basic-technosphere.npy"]
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+    assert array.dtype == expected["basic-technosphere.npy"].dtype
+    for label in ("row_value", "col_value", "amount", "flip"):
+        assert np.array_equal(array[label], expected["basic-technosphere.npy"][label])
+
+
+def test_load_data_obj_zipfile_compressed(tmp_path):
+    fp = zip_directory_fixture(tmp_path / "deflated.zip", zipfile.ZIP_DEFLATED)
+    obj = load_data_obj(fp, mmap_mode="r")
+    expected = load_data_obj(fixtures_dir / "basic-cp-directory")
+    array = obj["basic-biosphere.npy"]
+    assert not isinstance(array, np.memmap)
+    assert array.flags.writeable
+    for label in ("row_value", "col_value", "amount"):
+        assert np.array_equal(array[label], expected["basic-biosphere.npy"][label])
+
+
+def test_load_data_obj_zipfile_fortran_order(tmp_path):
+    array = np.asfortranarray(np.arange(12, dtype=np.float64).reshape((3, 4)))
+    fp = tmp_path / "fortran.zip"
+    with zipfile.ZipFile(fp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("a.npy", "w") as f:
+            np.save(f, array)
+    with zipfile.ZipFile(fp) as zf:
+        assert np.array_equal(load_zipped_array(zf, "a.npy"), array)
+
+
+def test_filter_data_for_matrix_max_workers():
+    fps = [
+        fixtures_dir / "basic-cp-directory",
+        fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip",
+    ] * 3
+    serial = filter_data_for_matrix([load_data_obj(fp) for fp in fps], "technosphere")
+    threaded = filter_data_for_matrix(
+        [load_data_obj(fp, lazy=True) for fp in fps], "technosphere", max_workers=4
+    )
+    assert threaded.shape == (18,)
+    for label in ("row_value", "col_value", "amount", "flip"):
+        assert np.array_equal(threaded[label], serial[label])
+
+
+def test_load_data_obj_max_workers():
+    fp = fixtures_dir / "basic-calculation-package" / "basic-calculation-package.zip"
+    obj = load_data_obj(fp, max_workers=4)
+    assert isinstance(obj, dict)
+    assert len(obj) == 4
+    assert obj["basic-biosphere.npy"].shape == (2,)
+
 
 def test_get_seeds_different_under_mp_pool():
     with multiprocessing.Pool(processes=4) as pool: